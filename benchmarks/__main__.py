@@ -0,0 +1,81 @@
+from argparse import ArgumentParser
+from json import dump, load
+from multiprocessing import get_context
+from os.path import join
+from platform import platform, python_version
+from sys import exit
+from tempfile import TemporaryDirectory
+from benchmarks.stages import stages, runStage, countNotes
+from benchmarks.synth import cases, writeCase
+
+def parseArgs(args=None):
+    parser = ArgumentParser(prog='benchmarks', description='用合成的 MIDI 文件测量 midi2exo 各阶段的转换速度')
+    parser.add_argument('-c', '--case', action='append', choices=sorted(cases), help='只运行指定的用例（可多次指定）')
+    parser.add_argument('-t', '--stage', action='append', choices=stages, help='只运行指定的阶段（可多次指定）')
+    parser.add_argument('-s', '--scale', type=float, default=1.0, help='音符数量的倍数')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='每个阶段的运行次数，取最快的一次')
+    parser.add_argument('-o', '--output', help='将结果保存为 JSON 文件')
+    parser.add_argument('-b', '--baseline', help='与之前保存的 JSON 结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='比基准慢多少（比例）视为性能下降')
+    return parser.parse_args(args)
+
+def run(args):
+    context = get_context('spawn')
+    results = {}
+    with TemporaryDirectory() as folder:
+        for name in args.case or sorted(cases):
+            file = join(folder, name + '.mid')
+            writeCase(file, name, args.scale)
+            with context.Pool(1) as pool:
+                notes = pool.apply(countNotes, (file,))
+            results[name] = {'notes': notes, 'stages': {}}
+            for stage in args.stage or stages:
+                with context.Pool(1) as pool:
+                    seconds, peak = pool.apply(runStage, (file, stage, args.repeat))
+                results[name]['stages'][stage] = {'seconds': seconds, 'notesPerSec': notes / seconds if seconds else None, 'peakRss': peak}
+                print(formatRow(name, stage, results[name]['stages'][stage]))
+    return results
+def formatRow(name, stage, result, baseline=None):
+    peak = '{0:8.1f} MB'.format(result['peakRss'] / (1 << 20)) if result['peakRss'] is not None else '       - MB'
+    row = '{0:10} {1:10} {2:9.3f} 秒 {3:14,.0f} 音符/秒 {4}'.format(name, stage, result['seconds'], result['notesPerSec'] or 0, peak)
+    if baseline is not None:
+        row += '  {0:+7.1%}'.format(result['seconds'] / baseline['seconds'] - 1)
+    return row
+def compare(results, baseline, tolerance):
+    # Returns the (case, stage) pairs that got slower than the baseline by more than tolerance
+    slower = []
+    print('与基准比较（正数表示变慢）：')
+    for name, case in results.items():
+        for stage, result in case['stages'].items():
+            old = baseline['cases'].get(name, {}).get('stages', {}).get(stage)
+            if old is None:
+                continue
+            print(formatRow(name, stage, result, old))
+            if result['seconds'] > old['seconds'] * (1 + tolerance):
+                slower.append((name, stage))
+    return slower
+
+def main(args=None):
+    args = parseArgs(args)
+    from midi2exo import version
+    from midi2exo.timing import numpy
+    report = {
+        'version': version, 'python': python_version(), 'platform': platform(), 'numpy': numpy is not None,
+        'scale': args.scale, 'repeat': args.repeat, 'cases': run(args),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = load(f)
+        if baseline.get('scale') != args.scale:
+            print('警告：基准的音符数量倍数为 {0}，与本次的 {1} 不同'.format(baseline.get('scale'), args.scale))
+        slower = compare(report['cases'], baseline, args.tolerance)
+        if slower:
+            print('性能下降：' + '、'.join('{0}/{1}'.format(*pair) for pair in slower))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,47 @@
+from mido import MidiFile
+from os.path import dirname
+from sys import platform as system
+from time import perf_counter
+from midi2exo import Project, extractSong, loadSong, handleMidi, refreshChannels, saveExo
+
+# Stages in pipeline order: parse / extract are mido's reader and extractSong, scan is the
+# default reader (parse and extraction in one pass), frames is handleMidi plus the frame
+# conversion, serialize is saveExo
+stages = ['parse', 'extract', 'scan', 'frames', 'serialize']
+
+def peakRss():
+    # Peak resident set size of this process in bytes, None where the resource module is missing
+    try:
+        from resource import getrusage, RUSAGE_SELF
+    except ImportError:
+        return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    return peak if system == 'darwin' else peak * 1024
+def runStage(file, stage, repeat):
+    # Runs in a fresh process so the peak RSS belongs to this stage (and the stages it needs)
+    project = Project(srcPath=dirname(file))
+    if stage == 'parse':
+        work = lambda: MidiFile(file)
+    elif stage == 'extract':
+        midi = MidiFile(file)
+        work = lambda: extractSong(midi)
+    else:
+        song = loadSong(file, jobs=1)
+        if stage == 'scan':
+            work = lambda: loadSong(file, jobs=1)
+        elif stage == 'frames':
+            work = lambda: [ch.items.frames(project.rate) for ch in handleMidi(song, project)[0]]
+        else:
+            channels, _ = handleMidi(song, project)
+            refreshChannels(channels, project)
+            output = file + '.exo'
+            work = lambda: saveExo(output, song, channels, project)
+    best = None
+    for _ in range(repeat):
+        begin = perf_counter()
+        work()
+        seconds = perf_counter() - begin
+        best = seconds if best is None else min(best, seconds)
+    return best, peakRss()
+def countNotes(file):
+    return sum(len(track) for track in loadSong(file, jobs=1).tracks)
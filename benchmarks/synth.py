@@ -0,0 +1,60 @@
+from random import Random
+from struct import pack
+
+# Synthetic Standard MIDI Files for the benchmarks, written byte by byte so that even files with
+# millions of events are generated in seconds
+cases = {
+    'orchestra': dict(tracks=64, notes=500, chords=0.2),
+    'dense': dict(tracks=4, notes=10000, chords=0.5),
+    'ramp': dict(tracks=16, notes=1250, ramp=500),
+    'noise': dict(tracks=8, notes=1250, noise=16),
+}
+
+def varLen(value):
+    data = [value & 0x7F]
+    value >>= 7
+    while value:
+        data.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(data))
+def chunk(kind, events):
+    body = b''.join(varLen(delta) + data for delta, data in events)
+    return kind + pack('>L', len(body)) + body
+def meta(metaType, data):
+    return bytes([0xFF, metaType]) + varLen(len(data)) + data
+def conductor(ramp, ticksPerBeat):
+    # 120 BPM, or a ramp from 120 to 240 BPM with one tempo change per beat
+    events = [(0, meta(0x03, b'Conductor')), (0, meta(0x51, pack('>L', 500000)[1:]))]
+    for beat in range(1, ramp + 1):
+        tempo = round(500000 / (1 + beat / ramp))
+        events.append((ticksPerBeat, meta(0x51, pack('>L', tempo)[1:])))
+    events.append((0, meta(0x2F, b'')))
+    return chunk(b'MTrk', events)
+def noteTrack(index, notes, chords, noise, random):
+    events = [(0, meta(0x03, 'Track {0}'.format(index).encode()))]
+    channel = index % 16
+    for _ in range(notes):
+        gap = random.choice((120, 240, 480))
+        # controller noise spread over the gap before the note
+        step = gap // (noise + 1)
+        for _ in range(noise):
+            events.append((step, bytes([0xB0 | channel, random.randrange(128), random.randrange(128)])))
+        key = 36 + random.randrange(48)
+        keys = [key] + ([key + 4, key + 7] if random.random() < chords else [])
+        for n, k in enumerate(keys):
+            events.append((0 if n else gap - noise * step, bytes([0x90 | channel, k, 1 + random.randrange(127)])))
+        for n, k in enumerate(keys):
+            events.append((0 if n else 60, bytes([0x80 | channel, k, 0])))
+    events.append((0, meta(0x2F, b'')))
+    return chunk(b'MTrk', events)
+def makeMidi(tracks, notes, chords=0.0, ramp=0, noise=0, seed=0, ticksPerBeat=480):
+    random = Random(seed)
+    chunks = [conductor(ramp, ticksPerBeat)]
+    for index in range(tracks):
+        chunks.append(noteTrack(index, notes, chords, noise, random))
+    return b'MThd' + pack('>LhhH', 6, 1, len(chunks), ticksPerBeat) + b''.join(chunks)
+def writeCase(path, name, scale=1.0):
+    params = dict(cases[name])
+    params['notes'] = max(1, round(params['notes'] * scale))
+    with open(path, 'wb') as f:
+        f.write(makeMidi(**params))
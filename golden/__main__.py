@@ -0,0 +1,281 @@
+from argparse import ArgumentParser
+from difflib import unified_diff
+from glob import glob
+from mido import MidiFile, bpm2tempo, tick2second
+from os import sep
+from os.path import basename, dirname, join, splitext
+from random import Random
+from sys import exit
+from tempfile import TemporaryDirectory
+from midi2exo import Channel, ExoCache, Project, Song, dialects, extractSong, loadSong, handleMidi, refreshChannels, saveExo, appendExo, buildExo, writeExo
+from pyaviutl.reader import readExo as readTimeline
+from benchmarks.synth import makeMidi
+
+# Reference MIDIs in golden/midi and, for every variant, the EXO expected for them in golden/exo.
+# Those are written by the legacy pipeline below (-u), except for originals: exports of the
+# program as it was before this package (midi2exo_117b.py / midi2exo_116d.py of the first
+# commit, saved from the window), which -u never touches. That program took the tempo of the
+# last set_tempo read so far in any track and counted note-ons of velocity 0 as notes, so only
+# a file where neither makes a difference can be among them. The media folder does not exist, so
+# paths never depend on the machine
+corpus = join(dirname(__file__), 'midi')
+expected = join(dirname(__file__), 'exo')
+srcPath = 'C:/素材'
+variants = {
+    '117b': dict(project=dict(dialect='117b')),
+    '116d': dict(project=dict(dialect='116d', rate=30, alpha=2, flip=0)),
+    '117b-bpm': dict(project=dict(dialect='117b', rate=24, width=1280, height=720, ext='mov'), bpm=150),
+    '116d-partial': dict(project=dict(dialect='116d', audioRate=44100), disable=(0, 2)),
+    '117b-held': dict(project=dict(dialect='117b', held=True)),
+}
+originals = {('single', '117b'), ('single', '116d'), ('single', '117b-bpm'), ('single', '116d-partial')}
+
+def settingsOf(variant):
+    settings = variants[variant]
+    project = Project(srcPath=srcPath, **settings['project'])
+    targetTempo = bpm2tempo(settings['bpm']) if 'bpm' in settings else None
+    return settings, project, targetTempo
+def prepare(song, variant):
+    settings, project, targetTempo = settingsOf(variant)
+    channels, _ = handleMidi(song, project, targetTempo)
+    for index in settings.get('disable', ()):
+        if index < len(channels):
+            channels[index].enabled = False
+    refreshChannels(channels, project)
+    return channels, project
+
+# The legacy pipeline shares nothing with the package's reading and timing: notes come from mido
+# messages, each is timed on its own with mido.tick2second, the length is mido's MidiFile.length
+# and the export the in-memory buildExo / writeExo. Only media paths are looked up the same way
+class LegacyNotes(list):
+    held = False
+def legacyNotes(track, held):
+    # [start, end] ticks of the track's notes in start order, or None without note-ons
+    tick, notes, sounding, found = 0, [], {}, False
+    for msg in track:
+        tick += msg.time
+        if msg.type == 'note_on' and msg.velocity > 0:
+            found = True
+            if held:
+                sounding.setdefault((msg.channel, msg.note), []).append(len(notes))
+                notes.append([tick, None])
+            elif not notes or notes[-1][0] != tick:
+                if notes:
+                    notes[-1][1] = tick
+                notes.append([tick, None])
+        elif held and msg.type in ('note_on', 'note_off') and sounding.get((msg.channel, msg.note)):
+            notes[sounding[(msg.channel, msg.note)].pop(0)][1] = tick
+    for note in notes:
+        if note[1] is None:
+            note[1] = tick
+    if held:
+        notes = [note for note in notes if note[1] > note[0]]
+    return notes if found else None
+def legacySeconds(tick, ticksPerBeat, changes, tempo):
+    # Every tempo's span up to tick; of several changes on one tick the last one read counts
+    seconds, prev = 0.0, 0
+    for changeTick, changeTempo in changes:
+        if changeTick > tick:
+            break
+        if changeTick != prev:
+            seconds += tick2second(changeTick - prev, ticksPerBeat, tempo)
+            prev = changeTick
+        tempo = changeTempo
+    return seconds + tick2second(tick - prev, ticksPerBeat, tempo)
+def legacyLayers(notes, base):
+    # Held notes go to the lowest layer whose last note has ended
+    layers, ends = [], []
+    for start, end in notes:
+        free = [index for index, last in enumerate(ends) if last <= start]
+        if free:
+            ends[free[0]] = end
+            layers.append(base + free[0])
+        else:
+            ends.append(end)
+            layers.append(base + len(ends) - 1)
+    return layers, len(ends)
+def legacyExo(file, variant, output):
+    settings, project, targetTempo = settingsOf(variant)
+    midi = MidiFile(file)
+    changes = []
+    for track in midi.tracks:
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            if msg.type == 'set_tempo':
+                changes.append((tick, msg.tempo))
+    changes.sort(key=lambda change: change[0])
+    if targetTempo:
+        changes = []
+    ExoVideo = dialects[project.dialect].ExoVideo
+    channels, layer = [], 1
+    for track in midi.tracks:
+        notes = legacyNotes(track, project.held)
+        if notes is None:
+            continue
+        layers, count = legacyLayers(notes, layer) if project.held else ([layer] * len(notes), 1)
+        items = LegacyNotes(ExoVideo(
+            start=legacySeconds(start, midi.ticks_per_beat, changes, targetTempo or 500000),
+            end=legacySeconds(end, midi.ticks_per_beat, changes, targetTempo or 500000),
+            layer=noteLayer) for (start, end), noteLayer in zip(notes, layers))
+        items.held = project.held
+        ch = Channel(track.name, items, '', project.alpha, project.flip)
+        ch.resolve(project.srcPath, project.ext)
+        channels.append(ch)
+        layer += count
+    for index in settings.get('disable', ()):
+        if index < len(channels):
+            channels[index].enabled = False
+    writeExo(output, buildExo(Song(midi.ticks_per_beat, [], [], midi.length), channels, project))
+def fastExo(file, variant, output, jobs=1, cache=None):
+    # The default reader and the streaming saveExo, optionally reusing rendered channels
+    song = loadSong(file, jobs=jobs, held=variants[variant]['project'].get('held', False))
+    channels, project = prepare(song, variant)
+    saveExo(output, song, channels, project, cache=cache)
+    if cache is not None:
+        saveExo(output, song, channels, project, cache=cache)
+pipelines = [
+    ('legacy', legacyExo),
+    ('fast', fastExo),
+    ('fast-jobs', lambda file, variant, output: fastExo(file, variant, output, jobs=2)),
+    ('fast-cache', lambda file, variant, output: fastExo(file, variant, output, cache=ExoCache())),
+]
+
+def readExo(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    # the corpus is written with '/' separators
+    return data.decode('GBK').replace(sep, '/').encode('GBK') if sep != '/' else data
+def showDiff(old, new, oldName, newName, limit=20):
+    lines = unified_diff(old.decode('GBK').splitlines(), new.decode('GBK').splitlines(), oldName, newName, lineterm='')
+    for index, line in enumerate(lines):
+        if index == limit:
+            print('  ...')
+            break
+        print('  ' + line)
+def expectedPath(file, variant):
+    return join(expected, '{0}.{1}.exo'.format(splitext(basename(file))[0], variant))
+
+def checkCorpus(folder):
+    # Every pipeline must reproduce the stored output byte for byte
+    failed = 0
+    for file in sorted(glob(join(corpus, '*.mid'))):
+        for variant in variants:
+            want = readExo(expectedPath(file, variant))
+            for name, pipeline in pipelines:
+                output = join(folder, 'out.exo')
+                pipeline(file, variant, output)
+                got = readExo(output)
+                if got != want:
+                    failed += 1
+                    print('[不同] {0} {1} {2}'.format(basename(file), variant, name))
+                    showDiff(want, got, expectedPath(file, variant), name)
+    return failed
+# A corpus song appended to the stored 117b export of another, saved with LF and with CRLF line
+# endings: the existing sections must come through unchanged, the new objects must be numbered
+# and layered after them, and everything written must use the file's line ending
+appendCases = [('basic', 'tempos'), ('type0', 'raw'), ('raw', 'basic')]
+def checkAppend(folder):
+    failed = 0
+    for baseName, songName in appendCases:
+        for newline in (b'\n', b'\r\n'):
+            name = '{0} + {1} ({2})'.format(baseName, songName, 'CRLF' if newline == b'\r\n' else 'LF')
+            path, fresh = join(folder, 'base.exo'), join(folder, 'fresh.exo')
+            with open(join(expected, baseName + '.117b.exo'), 'rb') as f:
+                data = f.read().replace(b'\r\n', b'\n').replace(b'\n', newline)
+            with open(path, 'wb') as f:
+                f.write(data)
+            before = readTimeline(path)
+            song = loadSong(join(corpus, songName + '.mid'))
+            channels, project = prepare(song, '117b')
+            saveExo(fresh, song, channels, project)
+            appendExo(path, song, channels, project)
+            with open(path, 'rb') as f:
+                out = f.read()
+            after, added = readTimeline(path), readTimeline(fresh)
+            body = data[before.bodyOffset:]
+            problems = []
+            if out.count(b'\r\n') != (out.count(b'\n') if newline == b'\r\n' else 0):
+                problems.append('换行符不一致')
+            if out[after.bodyOffset:after.bodyOffset + len(body)] != body:
+                problems.append('原有内容被改动')
+            elif not out[after.bodyOffset + len(body):].startswith(b'[%d]' % before.nextId + newline):
+                problems.append('追加的第一个对象编号不是 {0}'.format(before.nextId))
+            if after.nextId != before.nextId + len(added.objects):
+                problems.append('下一个对象编号为 {0}，应为 {1}'.format(after.nextId, before.nextId + len(added.objects)))
+            got = [(o.start, o.end, o.layer - before.maxLayer(), o.group) for o in after.objects[len(before.objects):]]
+            if got != [(o.start, o.end, o.layer, o.group) for o in added.objects]:
+                problems.append('追加的对象的时间或图层不对')
+            if int(after.exedit['length']) != max(int(before.exedit['length']), int(added.exedit['length'])):
+                problems.append('[exedit] 的长度不对')
+            for problem in problems:
+                failed += 1
+                print('[不同] 追加 {0}：{1}'.format(name, problem))
+    return failed
+def updateCorpus():
+    for file in sorted(glob(join(corpus, '*.mid'))):
+        for variant in variants:
+            if (splitext(basename(file))[0], variant) in originals:
+                continue
+            legacyExo(file, variant, expectedPath(file, variant))
+            print('[更新] ' + expectedPath(file, variant))
+def checkRandom(folder, count, seed):
+    # Random synthetic songs through the legacy and fast pipelines, and damaged corpus files
+    # through both readers: whatever mido reads, the default reader must read the same
+    random, failed = Random(seed), 0
+    sources = []
+    for file in sorted(glob(join(corpus, '*.mid'))):
+        with open(file, 'rb') as f:
+            sources.append(f.read())
+    for index in range(count):
+        file = join(folder, 'random.mid')
+        with open(file, 'wb') as f:
+            f.write(makeMidi(random.randint(1, 6), random.randint(1, 300), chords=random.random(), ramp=random.randint(0, 50),
+                noise=random.randint(0, 3), seed=random.randrange(1 << 30), ticksPerBeat=random.choice((96, 480, 960))))
+        variant = random.choice(sorted(variants))
+        results = {}
+        for name, pipeline in pipelines:
+            output = join(folder, name + '.exo')
+            pipeline(file, variant, output)
+            results[name] = readExo(output)
+        for name, got in results.items():
+            if got != results['legacy']:
+                failed += 1
+                print('[不同] 随机文件 {0} {1} {2}'.format(index, variant, name))
+                showDiff(results['legacy'], got, 'legacy', name)
+        data = bytearray(random.choice(sources))
+        for _ in range(random.randint(1, 4)):
+            data[random.randrange(14, len(data))] = random.randrange(256)
+        with open(file, 'wb') as f:
+            f.write(data)
+        for held in (False, True):
+            try:
+                want = songState(extractSong(MidiFile(file), held=held))
+            except Exception:
+                want = None
+            try:
+                got = songState(loadSong(file, held=held))
+            except Exception:
+                got = None
+            if got != want:
+                failed += 1
+                print('[不同] 损坏文件 {0}：两种读取方式的结果不同'.format(index))
+    return failed
+def songState(song):
+    return song.ticksPerBeat, song.tempoChanges, song.length, [(t.name, list(t.startTicks), list(t.endTicks)) for t in song.tracks]
+
+def main(args=None):
+    parser = ArgumentParser(prog='golden', description='用参考 MIDI 文件检查导出结果是否与原版完全相同，并对比新旧两种实现')
+    parser.add_argument('-u', '--update', action='store_true', help='用原版实现重新生成参考 EXO 文件')
+    parser.add_argument('-r', '--random', type=int, default=0, help='另外对比的随机 MIDI 文件数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机文件的种子')
+    args = parser.parse_args(args)
+    if args.update:
+        updateCorpus()
+    with TemporaryDirectory() as folder:
+        failed = checkCorpus(folder) + checkAppend(folder) + checkRandom(folder, args.random, args.seed)
+    print('共 {0} 处不同'.format(failed) if failed else '全部相同')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,11 @@
+from midi2exo.core import Cancelled, Channel, Project, dialects, exts, toFileName, getPath, parserVersion, extractSong, loadSong, handleMidi, retimeChannels, refreshChannels, anyNonExist, exeditSettings, saveExo, appendExo, buildExo, writeExo, convert
+from midi2exo.incremental import ExoCache
+from midi2exo.media import MediaIndex, mediaIndex
+from midi2exo.notes import NoteStore, Song, TrackNotes
+from midi2exo.scanner import ScanError, scanSong
+from midi2exo.songcache import SongCache
+from midi2exo.spans import Profiler, profiler
+from midi2exo.tempo import TempoMap
+from midi2exo.batch import BatchResult, expandInputs, convertMany
+
+version = '1.1a'
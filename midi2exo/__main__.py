@@ -0,0 +1,119 @@
+from argparse import ArgumentParser, ArgumentTypeError
+from mido import bpm2tempo
+from os.path import normpath, expanduser, exists, isdir
+from sys import exit
+from time import perf_counter
+from midi2exo import version, dialects, Project, loadSong, handleMidi, refreshChannels, saveExo, appendExo
+from midi2exo.songcache import SongCache, defaultCacheDir
+from midi2exo.batch import expandInputs, outputPath, convertMany
+from midi2exo.spans import profiler
+
+def positiveInt(text):
+    value = int(text)
+    if value < 1:
+        raise ArgumentTypeError('必须是正整数：{0}'.format(text))
+    return value
+def parseArgs(args=None):
+    parser = ArgumentParser(prog='midi2exo', description='利用 MIDI 文件生成 AviUtl exo 文件（无需图形界面）')
+    parser.add_argument('input', nargs='+', help='MIDI 文件、文件夹或通配符（如 "midi/*.mid"）')
+    parser.add_argument('-o', '--output', help='导出的 EXO 文件（批量转换时为导出文件夹），默认与 MIDI 文件同名')
+    parser.add_argument('-a', '--append', action='store_true', help='导出的 EXO 文件已存在时，将音符追加到其中已有对象之后（图层接在已用图层下方），而不是覆盖；仅转换单个文件时有效')
+    parser.add_argument('-j', '--jobs', type=positiveInt, help='进程数，默认为 CPU 核心数（批量转换时按文件分配，转换单个大文件时按轨道分配）')
+    parser.add_argument('-W', '--width', type=int, default=1920, help='图像宽度')
+    parser.add_argument('-H', '--height', type=int, default=1080, help='图像高度')
+    parser.add_argument('-r', '--fps', type=int, default=60, help='帧速率')
+    parser.add_argument('-s', '--sample-rate', type=int, default=48000, help='音频采样率')
+    parser.add_argument('-d', '--src', default=normpath(expanduser('~/Desktop')), help='默认素材位置')
+    parser.add_argument('-e', '--ext', default='mp4', help='首选素材扩展名')
+    parser.add_argument('--alpha', action='store_true', help='默认导入Alpha通道')
+    parser.add_argument('--no-flip', action='store_true', help='默认不启用左右翻转')
+    parser.add_argument('--bpm', type=float, help='覆盖 MIDI 中的 BPM')
+    parser.add_argument('--held', action='store_true', help='音符按 note_off 计算长度，保留和弦与重叠的音符，并自动分配到尽量少的图层')
+    parser.add_argument('--dialect', choices=sorted(dialects), default='117b', help='AviUtl 版本')
+    parser.add_argument('--cache-dir', default=defaultCacheDir(), help='MIDI 解析缓存位置')
+    parser.add_argument('--no-cache', action='store_true', help='不使用 MIDI 解析缓存')
+    parser.add_argument('--profile', action='store_true', help='输出各阶段的用时与计数')
+    parser.add_argument('--profile-out', metavar='FILE', help='将用时与计数保存为 JSON 文件；扩展名为 .prof 或 .pstats 时改为保存 cProfile 的结果')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不输出提示信息')
+    parser.add_argument('-V', '--version', action='version', version='midi2exo v{0}'.format(version))
+    return parser.parse_args(args)
+def projectFromArgs(args):
+    return Project(args.width, args.height, args.fps, args.sample_rate, normpath(args.src), args.ext,
+        alpha=args.alpha * 2, flip=(not args.no_flip) * 2, dialect=args.dialect, held=args.held)
+def cacheFromArgs(args):
+    return None if args.no_cache else SongCache(args.cache_dir)
+def convertSingle(args, project, targetTempo):
+    output = args.output or outputPath(args.input[0])
+    try:
+        song = loadSong(args.input[0], cache=cacheFromArgs(args), jobs=args.jobs, held=project.held)
+    except Exception as e:
+        print('错误：文件无法读取，该文件可能不是midi文件（{0}: {1}）'.format(type(e).__name__, e))
+        return 1
+    channels, _ = handleMidi(song, project, targetTempo)
+    refreshChannels(channels, project)
+    if not args.quiet:
+        for index, ch in enumerate(channels):
+            if not ch.exists:
+                print('警告：轨道 {0} ({1}) 的素材文件不存在：{2}'.format(index, ch.name, ch.path))
+    # e.g. type 2 files (no song length), an unwritable output or an appended file that is not an exo
+    append = args.append and exists(output)
+    try:
+        if append:
+            appendExo(output, song, channels, project)
+        else:
+            saveExo(output, song, channels, project)
+    except Exception as e:
+        print('错误：EXO 文件无法导出（{0}: {1}）'.format(type(e).__name__, e))
+        return 1
+    if not args.quiet:
+        print(('已追加到 EXO 文件：{0}' if append else 'EXO 文件已成功导出：{0}').format(output))
+    return 0
+def convertBatch(args, project, targetTempo):
+    files = expandInputs(args.input)
+    if not files:
+        print('错误：没有找到 MIDI 文件')
+        return 1
+    begin, failed = perf_counter(), 0
+    for result in convertMany(files, project, args.output, targetTempo, args.jobs, cacheFromArgs(args)):
+        if result.ok():
+            if not args.quiet:
+                print('[完成] {0} -> {1}（{2} 个音符，{3:.3f} 秒）'.format(result.file, result.output, result.notes, result.seconds))
+        else:
+            failed += 1
+            print('[失败] {0}：{1}'.format(result.file, result.error))
+    if not args.quiet:
+        print('共 {0} 个文件，成功 {1} 个，失败 {2} 个，用时 {3:.3f} 秒'.format(len(files), len(files) - failed, failed, perf_counter() - begin))
+    return 1 if failed else 0
+def run(args, project, targetTempo):
+    if len(args.input) == 1 and not isdir(args.input[0]) and not any(c in args.input[0] for c in '*?['):
+        return convertSingle(args, project, targetTempo)
+    return convertBatch(args, project, targetTempo)
+def runProfiled(args, project, targetTempo):
+    # Spans and counters come from the profiler; a .prof / .pstats output also runs under cProfile,
+    # which only sees this process (not batch workers)
+    out = args.profile_out
+    pstats = out is not None and out.lower().endswith(('.prof', '.pstats'))
+    profiler.start()
+    if pstats:
+        from cProfile import Profile
+        cprofile = Profile()
+        code = cprofile.runcall(run, args, project, targetTempo)
+        cprofile.dump_stats(out)
+    else:
+        code = run(args, project, targetTempo)
+    profiler.stop()
+    if out is not None and not pstats:
+        profiler.dump(out)
+    if args.profile:
+        print(profiler.format())
+    return code
+def main(args=None):
+    args = parseArgs(args)
+    project = projectFromArgs(args)
+    targetTempo = bpm2tempo(args.bpm) if args.bpm else None
+    if args.profile or args.profile_out:
+        return runProfiled(args, project, targetTempo)
+    return run(args, project, targetTempo)
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob, escape
+from os import makedirs
+from os.path import basename, curdir, dirname, isdir, join, normcase, abspath, relpath, splitext
+from time import perf_counter
+from midi2exo.core import convert
+from midi2exo.spans import profiler
+
+midiExts = ('.mid', '.midi')
+
+class BatchResult:
+    def __init__(self, file, output, seconds, error=None, notes=0, profile=None):
+        self.file, self.output, self.seconds, self.error, self.notes = file, output, seconds, error, notes
+        self.profile = profile
+    def ok(self):
+        return self.error is None
+
+def isMidi(file):
+    return splitext(file)[1].lower() in midiExts and not isdir(file)
+def globRoot(pattern):
+    # The folder part of a pattern before its first wildcard
+    while any(c in pattern for c in '*?['):
+        pattern = dirname(pattern)
+    return pattern or curdir
+def expandInputs(inputs):
+    # (file, name) for every MIDI file, where name is its path below an output folder: the file
+    # name, or for patterns the path below the folder the pattern starts in, so that files of the
+    # same name found by a recursive pattern do not share an output. A file matched by several
+    # inputs is converted once
+    files, seen = [], set()
+    for i in inputs:
+        if isdir(i):
+            found = [(f, basename(f)) for f in sorted(glob(join(escape(i), '*'))) if isMidi(f)]
+        elif any(c in i for c in '*?['):
+            root = globRoot(i)
+            found = [(f, relpath(f, root)) for f in sorted(glob(i, recursive=True)) if isMidi(f)]
+        else:
+            found = [(i, basename(i))]
+        for file, name in found:
+            key = normcase(abspath(file))
+            if key not in seen:
+                seen.add(key)
+                files.append((file, name))
+    return files
+def outputPath(file, outDir=None, name=None):
+    if not outDir:
+        return splitext(file)[0] + '.exo'
+    return join(outDir, splitext(name or basename(file))[0] + '.exo')
+def planOutputs(files, outDir=None):
+    # Output path of every (file, name) and, for files that would share one, the error they fail
+    # with: which of them would be written last is not known in a pool, so none of them is
+    outputs = [outputPath(file, outDir, name) for file, name in files]
+    owners = {}
+    for (file, _), output in zip(files, outputs):
+        owners.setdefault(normcase(abspath(output)), []).append(file)
+    errors = []
+    for (file, _), output in zip(files, outputs):
+        others = [f for f in owners[normcase(abspath(output))] if f != file]
+        errors.append('与 {0} 导出到同一文件'.format('、'.join(others)) if others else None)
+    return outputs, errors
+
+def convertOne(file, output, project, targetTempo=None, cache=None, jobs=None, profile=False):
+    # With profile set (in pool workers) the file's spans and counters are sent back in the result
+    begin = perf_counter()
+    if profile:
+        profiler.start()
+    try:
+        channels = convert(file, output, project, targetTempo, cache, jobs)
+    except Exception as e:
+        return BatchResult(file, output, perf_counter() - begin, '{0}: {1}'.format(type(e).__name__, e))
+    report = profiler.report() if profile else None
+    return BatchResult(file, output, perf_counter() - begin, notes=sum(ch.size() for ch in channels if ch.enabled), profile=report)
+def convertMany(files, project, outDir=None, targetTempo=None, workers=None, cache=None):
+    # files are (file, name) pairs from expandInputs. Yields a BatchResult per file as soon as it
+    # finishes; a failing file never aborts the run. While the profiler is enabled, what the
+    # workers measured is added to it
+    outputs, errors = planOutputs(files, outDir)
+    pending = []
+    for (file, _), output, error in zip(files, outputs, errors):
+        if error is None and outDir:
+            try:
+                makedirs(dirname(output), exist_ok=True)
+            except OSError as e:
+                error = '{0}: {1}'.format(type(e).__name__, e)
+        if error is None:
+            pending.append((file, output))
+        else:
+            yield BatchResult(file, output, 0.0, error)
+    if workers == 1 or len(pending) <= 1:
+        for file, output in pending:
+            yield convertOne(file, output, project, targetTempo, cache, workers)
+        return
+    # files are already spread over the pool, so each one scans its tracks in-process
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(convertOne, file, output, project, targetTempo, cache, 1, profiler.enabled): (file, output) for file, output in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+                if result.profile:
+                    profiler.merge(result.profile)
+                yield result
+            except Exception as e:
+                # the worker process itself died (e.g. out of memory)
+                file, output = futures[future]
+                yield BatchResult(file, output, 0.0, '{0}: {1}'.format(type(e).__name__, e))
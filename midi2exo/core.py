@@ -0,0 +1,376 @@
+from array import array
+from copy import deepcopy
+from heapq import merge
+from math import ceil
+from mido import MidiFile
+from os import cpu_count
+from os.path import getsize, normpath
+from pyaviutl.dialects import dialects
+from pyaviutl.exo import ExoVideo
+from pyaviutl.reader import readExo
+from pyaviutl.template import ExoObject
+from pyaviutl.writer import ExoWriter
+from midi2exo.incremental import ExoCache, RenderedChannel, channelKey, placeholder
+from midi2exo.layers import packLayers
+from midi2exo.media import mediaIndex
+from midi2exo.notes import HeldNotes, NoteStore, Song, TrackNotes
+from midi2exo.scanner import ScanError, mapFile, parallelBytes, scanSong
+from midi2exo.spans import profiler
+from midi2exo.tempo import TempoMap, defaultTempo, songLength
+
+illegalChars = dict((ord(char), None) for char in '\/*?:"<>|')
+exts = ['mp4', 'ts', 'wmv', 'mov', 'mkv', 'avi']
+def toFileName(s):
+    return s.translate(illegalChars)
+def getPath(prvPath, prefix, default):
+    for i in [default, *exts]:
+        nowPath = normpath(prvPath + '/' + toFileName(prefix + '.' + i))
+        if mediaIndex.exists(nowPath):
+            return nowPath
+    return normpath(prvPath + '/' + toFileName(prefix + '.' + default))
+
+class Channel:
+    def __init__(self, name, items, path, alpha, flip):
+        self.items = items
+        self.name = name
+        self.auto = True
+        self.path = path
+        self.alpha = alpha
+        self.flip = flip
+        self.exists = False
+        self.enabled = True
+        # (source folder, extension) the automatic path was found with, and the path whose existence was checked
+        self.resolvedFor = None
+        self.checkedPath = None
+    def resolve(self, srcPath, ext):
+        self.path = getPath(srcPath, self.name, ext)
+        self.resolvedFor = (srcPath, ext)
+    def clearAuto(self):
+        self.auto = False
+    def keepEdits(self, old):
+        # Takes over what was set by hand for old, the same track read before (e.g. without held notes)
+        self.enabled = old.enabled
+        if not old.auto:
+            self.path, self.alpha, self.flip = old.path, old.alpha, old.flip
+            self.clearAuto()
+    def size(self):
+        return len(self.items)
+class Project:
+    def __init__(self, width=1920, height=1080, rate=60, audioRate=48000, srcPath='', ext='mp4', alpha=0, flip=2, dialect='117b', held=False):
+        self.width, self.height, self.rate, self.audioRate = width, height, rate, audioRate
+        self.srcPath, self.ext = srcPath, ext
+        # alpha / flip use Qt check states (0 = off, 2 = on) like the GUI
+        self.alpha, self.flip = alpha, flip
+        self.dialect = dialect
+        # read notes until their note-off and spread them over layers (see HeldNotes, packLayers)
+        self.held = held
+
+class Cancelled(Exception):
+    pass
+
+# Bump whenever extractSong changes what ends up in a Song, so cached songs are read again
+parserVersion = 2
+
+# progress(done, total) is called after every track and may raise Cancelled to stop. With held
+# set, notes last until their note-off and chords are kept (see HeldNotes)
+def extractSong(midi, progress=None, held=False):
+    tracks, changes, trackTicks = [], [], []
+    endTick = 0
+    for trackIndex, track in enumerate(midi.tracks):
+        notes = None
+        ticks = array('q')
+        nowPosition = 0
+        lastStart = None
+        sounding = HeldNotes() if held else None
+        for msg in track:
+            nowPosition += msg.time
+            if msg.type == 'end_of_track':
+                continue
+            if not ticks or ticks[-1] != nowPosition:
+                ticks.append(nowPosition)
+            if msg.type == 'set_tempo':
+                changes.append((nowPosition, msg.tempo))
+            elif msg.type == 'note_on' and msg.velocity > 0:
+                if sounding is not None:
+                    sounding.noteOn(nowPosition, msg.channel, msg.note)
+                    continue
+                if notes is None:
+                    notes = TrackNotes(track.name)
+                    tracks.append(notes)
+                if lastStart == nowPosition:
+                    continue
+                if lastStart is not None:
+                    notes.append(lastStart, nowPosition)
+                lastStart = nowPosition
+            elif sounding is not None and msg.type in ('note_on', 'note_off'):
+                sounding.noteOff(nowPosition, msg.channel, msg.note)
+        if lastStart is not None:
+            notes.append(lastStart, nowPosition)
+        if sounding is not None and sounding.startTicks:
+            tracks.append(sounding.finish(track.name, nowPosition))
+        trackTicks.append(ticks)
+        endTick = max(endTick, nowPosition)
+        if progress:
+            progress(trackIndex + 1, len(midi.tracks))
+    length = None
+    if midi.type != 2:
+        length = songLength(merge(*trackTicks), endTick, TempoMap(midi.ticks_per_beat, changes))
+    return Song(midi.ticks_per_beat, changes, tracks, length, held)
+# With fast set, the mapped file is scanned by scanSong and only handed to mido if the scanner
+# rejects it, so the whole file is never held in memory on the fast path. jobs is the number of
+# processes to scan tracks with; by default large files use every core. held is passed on to
+# extractSong / scanSong
+def loadSong(file, progress=None, cache=None, fast=True, jobs=None, held=False):
+    with profiler.span('load'):
+        song = readSong(file, progress, cache, fast, jobs, held)
+    profiler.count('notes', sum(len(track) for track in song.tracks))
+    return song
+def readSong(file, progress, cache, fast, jobs, held):
+    song = None
+    with mapFile(file) as data:
+        if cache is not None:
+            with profiler.span('cache'):
+                key = cache.key(data, '{0}-held'.format(parserVersion) if held else parserVersion)
+                song = cache.get(key)
+            if song is not None:
+                # the cache keeps the notes only
+                song.held = held
+                return song
+        if fast:
+            if jobs is None:
+                jobs = (cpu_count() or 1) if len(data) >= parallelBytes else 1
+            try:
+                with profiler.span('scan'):
+                    song = scanSong(data, progress, file, jobs, held)
+            except ScanError:
+                pass
+    if song is None:
+        with profiler.span('parse'):
+            midi = MidiFile(file)
+        with profiler.span('extract'):
+            song = extractSong(midi, progress, held)
+    if cache is not None:
+        cache.put(key, song)
+    return song
+def handleMidi(song, project, targetTempo=None, resolve=True):
+    # Every track gets one layer, or with held notes as many as it needs, below the previous track.
+    # Without resolve, media paths are left for refreshChannels to look up (the window's loader
+    # thread must not touch mediaIndex while the GUI thread may be refreshing it)
+    dialect = dialects[project.dialect]
+    channels = []
+    layer = 1
+    for track in song.tracks:
+        if song.held:
+            layers, count = packLayers(track.startTicks, track.endTicks, layer)
+        else:
+            layers, count = array('i', [layer]) * len(track), 1
+        notes = NoteStore(dialect.ExoVideo, track.startTicks, track.endTicks, layers, song.held)
+        channels.append(Channel(track.name, notes, '', project.alpha, project.flip))
+        layer += count
+    if resolve:
+        with profiler.span('resolve'):
+            for ch in channels:
+                ch.resolve(project.srcPath, project.ext)
+    # Tempo changes apply to every track, so notes are only timed once the whole file is read
+    tempoMap = TempoMap(song.ticksPerBeat, () if targetTempo else song.tempoChanges, targetTempo or defaultTempo)
+    retimeChannels(channels, tempoMap)
+    return channels, tempoMap
+# Notes keep their ticks, so a new tempo only rescales them without reading the file again
+def retimeChannels(channels, tempoMap):
+    with profiler.span('retime'):
+        for ch in channels:
+            ch.items.retime(tempoMap)
+def refreshChannels(channels, project, force=False):
+    # Automatic paths are only looked up again when the source folder, extension or the folder's
+    # contents changed, and existence is only checked again for paths that were looked up or
+    # changed, unless force is set; returns the indices of the channels whose path or existence changed
+    with profiler.span('resolve'):
+        return refresh(channels, project, force)
+def refresh(channels, project, force):
+    if force:
+        mediaIndex.clear()
+    else:
+        force = mediaIndex.revalidate()
+    key = (project.srcPath, project.ext)
+    changed = []
+    for index, i in enumerate(channels):
+        path, found = i.path, i.exists
+        resolve = i.auto and (force or i.resolvedFor != key)
+        if resolve:
+            i.resolve(project.srcPath, project.ext)
+        if force or resolve or i.checkedPath != i.path:
+            i.exists = mediaIndex.exists(i.path)
+            i.checkedPath = i.path
+        if i.path != path or i.exists != found:
+            changed.append(index)
+    return changed
+def anyNonExist(channels):
+    for i in channels:
+        if i.enabled and not i.exists:
+            return True
+    return False
+
+def exeditSettings(song, project):
+    if song.length is None:
+        raise ValueError('impossible to compute length for type 2 (asynchronous) file')
+    return {
+        'width': project.width,
+        'height': project.height,
+        'rate': project.rate,
+        'scale': 1,
+        'audio_rate': project.audioRate,
+        'audio_ch': 2,
+        'length': ceil(song.length * project.rate), # !Important: Length must be calculated
+    }
+def channelObjects(ch, rate, length, base, layerBase=0):
+    # The channel's notes as objects numbered from base, on their layer plus layerBase; unless
+    # the notes are held ones, its last object lasts until the end
+    flip = ch.flip // 2
+    notes = ch.items
+    with profiler.span('frames'):
+        starts, ends = notes.frames(rate)
+    last = -1 if notes.held else len(notes) - 1
+    for index in range(len(notes)):
+        yield ExoObject(
+            start = starts[index],
+            end = length if index == last else ends[index],
+            layer = layerBase + notes.layers[index],
+            flip = flip * ((base + index) % 2)
+        )
+
+# progress(done, total) is called every progressStep objects and may raise Cancelled to stop;
+# the file at path is only replaced once the export is complete. With an ExoCache, channels that
+# did not change since the previous export with the same cache are reused instead of rendered
+progressStep = 1024
+def saveExo(path, song, channels, project, progress=None, cache=None):
+    # Streams every object straight to the file instead of building the whole exo dict first
+    dialect = dialects[project.dialect]
+    exedit = exeditSettings(song, project)
+    rate, length = exedit['rate'], exedit['length']
+    total = sum(ch.size() for ch in channels if ch.enabled)
+    with profiler.span('save'), ExoWriter(path) as writer:
+        with profiler.span('serialize'):
+            writer.writeExedit(exedit)
+            for ch in channels:
+                if not ch.enabled:
+                    continue
+                template = dialect.template(ch.path, ch.alpha//2)
+                if cache is not None:
+                    key = channelKey(ch, project.dialect, rate, length, writer.count)
+                    rendered = cache.get(ch, key)
+                    if rendered is None:
+                        rendered = RenderedChannel(b''.join(template.render(placeholder, obj) for obj in channelObjects(ch, rate, length, writer.count)), ch.size())
+                        cache.put(ch, key, rendered)
+                    else:
+                        profiler.count('reused')
+                    writer.writeRendered(rendered.renumber(writer.count), rendered.count)
+                    if progress:
+                        progress(writer.count, total)
+                    continue
+                for obj in channelObjects(ch, rate, length, writer.count):
+                    writer.writeTemplated(template, obj)
+                    if progress and writer.count % progressStep == 0:
+                        progress(writer.count, total)
+            if progress:
+                progress(writer.count, total)
+        with profiler.span('write'):
+            writer.close()
+    profiler.count('objects', writer.count)
+    if profiler.enabled:
+        profiler.count('bytes', getsize(path))
+
+# Adds the objects after those of the exo at path, on the layers below its last used layer. The
+# existing sections are copied byte for byte; only the length in [exedit] grows if the song is longer
+def appendExo(path, song, channels, project, progress=None):
+    if song.length is None:
+        raise ValueError('impossible to compute length for type 2 (asynchronous) file')
+    dialect = dialects[project.dialect]
+    with profiler.span('read'):
+        timeline = readExo(path)
+    exedit = dict(timeline.exedit)
+    rate, scale = int(exedit['rate']), int(exedit.get('scale', 1))
+    if scale != 1:
+        rate /= scale
+    length = ceil(song.length * rate)
+    exedit['length'] = max(int(exedit.get('length', 0)), length)
+    layerBase = timeline.maxLayer()
+    total = sum(ch.size() for ch in channels if ch.enabled)
+    # written with the existing file's line ending, whatever the platform's is
+    with profiler.span('save'), ExoWriter(path, newline=timeline.newline) as writer:
+        with profiler.span('serialize'):
+            writer.writeExedit(exedit)
+            writer.copyFrom(path, timeline.bodyOffset, timeline.nextId)
+            for ch in channels:
+                if not ch.enabled:
+                    continue
+                template = dialect.template(ch.path, ch.alpha//2, timeline.newline)
+                for obj in channelObjects(ch, rate, length, writer.count, layerBase):
+                    writer.writeTemplated(template, obj)
+                    if progress and (writer.count - timeline.nextId) % progressStep == 0:
+                        progress(writer.count - timeline.nextId, total)
+            if progress:
+                progress(writer.count - timeline.nextId, total)
+        with profiler.span('write'):
+            writer.close()
+    profiler.count('objects', writer.count - timeline.nextId)
+
+# buildExo / writeExo keep the original in-memory export and serve as the reference for saveExo
+def buildExo(song, channels, project):
+    dialect = dialects[project.dialect]
+    exo = {}
+    exo['exedit'] = {
+        'width': project.width,
+        'height': project.height,
+        'rate': project.rate,
+        'scale': 1,
+        'audio_rate': project.audioRate,
+        'audio_ch': 2,
+    }
+    exo['exedit']['length'] = ceil(song.length * exo['exedit']['rate']) # !Important: Length must be calculated
+    nowObj = 0
+    for ch in channels:
+        if not ch.enabled:
+            continue
+        vid = dialect.SceneSettings(ch.path, alpha=ch.alpha//2)
+        for v in ch.items:
+            exo[nowObj] = deepcopy(v)
+            exo[nowObj].group = nowObj + 1
+            exo[nowObj]['sceneSettings'] = vid
+            exo[nowObj]['effects'][0]['左右翻转'] = ch.flip // 2 * (nowObj % 2)
+            exo[nowObj]['start'], exo[nowObj]['end'] = 1 + ceil(v['start'] * exo['exedit']['rate']), ceil(v['end'] * exo['exedit']['rate'])
+            nowObj += 1
+        if nowObj != 0 and not ch.items.held:
+            exo[nowObj-1]['end'] = exo['exedit']['length']
+    return exo
+def writeExo(path, exo):
+    with open(path, 'w', encoding='GBK') as f:
+        for key, value in exo.items():
+            f.write('[{0}]\n'.format(key))
+            if isinstance(value, ExoVideo):
+                attid = 1
+                for ikey, ival in value.items():
+                    if ikey == 'sceneSettings':
+                        f.write('[{0}.0]\n'.format(key))
+                        for skey, sval in ival.items():
+                            if skey == 'scene':
+                                f.write('={0}\n'.format(sval))
+                            else:
+                                f.write('{0}={1}\n'.format(skey, sval))
+                    elif ikey == 'effects':
+                        for e in ival:
+                            f.write('[{0}.{1}]\n'.format(key, attid))
+                            for akey, aval in e.items():
+                                f.write('{0}={1}\n'.format(akey, aval))
+                            attid += 1
+                    else:
+                        f.write('{0}={1}\n'.format(ikey, ival))
+            else:
+                for ikey, ival in value.items():
+                    f.write('{0}={1}\n'.format(ikey, ival))
+
+def convert(file, path, project, targetTempo=None, cache=None, jobs=None):
+    song = loadSong(file, cache=cache, jobs=jobs, held=project.held)
+    channels, _ = handleMidi(song, project, targetTempo)
+    refreshChannels(channels, project)
+    saveExo(path, song, channels, project)
+    return channels
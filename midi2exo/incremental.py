@@ -0,0 +1,38 @@
+from itertools import chain
+from weakref import WeakKeyDictionary
+
+# Stands in for the object number while a channel is rendered for the cache
+placeholder = b'\x00'
+
+class ExoCache:
+    # Rendered objects of every channel from the previous export with the object numbers left
+    # out, so that a channel whose settings and timing did not change is written again as is
+    # under its new numbers instead of being rendered object by object
+    def __init__(self):
+        self.channels = WeakKeyDictionary()
+    def get(self, ch, key):
+        entry = self.channels.get(ch)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+    def put(self, ch, key, rendered):
+        self.channels[ch] = (key, rendered)
+    def clear(self):
+        self.channels.clear()
+
+class RenderedChannel:
+    __slots__ = ('chunks', 'count', 'per')
+    def __init__(self, data, count):
+        self.chunks = data.split(placeholder)
+        self.count = count
+        # placeholders per object: [N] plus one for every [N.k] section
+        self.per = (len(self.chunks) - 1) // count if count else 0
+    def renumber(self, base):
+        numbers = [b'%d' % n for n in range(base, base + self.count) for _ in range(self.per)]
+        return b''.join(chain.from_iterable(zip(self.chunks, numbers))) + self.chunks[-1]
+
+def channelKey(ch, dialect, rate, length, base):
+    notes = ch.items
+    # alternating flips depend on whether the channel starts on an odd or even object
+    parity = base % 2 if ch.flip // 2 else 0
+    timing = hash((notes.starts.tobytes(), notes.ends.tobytes(), notes.layers.tobytes()))
+    return (ch.path, ch.alpha, ch.flip, dialect, rate, length, parity, timing, notes.held)
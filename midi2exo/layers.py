@@ -0,0 +1,21 @@
+from array import array
+from heapq import heappop, heappush
+
+def packLayers(startTicks, endTicks, base=1):
+    # Interval partitioning: notes taken in start order go to the lowest layer that is free again
+    # at their start, so notes that overlap never share a layer and no more layers are used than
+    # notes sound at once. Returns every note's layer, numbered from base, and the layer count
+    layers = array('i', [0]) * len(startTicks)
+    busy, free, count = [], [], 0
+    for index in sorted(range(len(startTicks)), key=startTicks.__getitem__):
+        start = startTicks[index]
+        while busy and busy[0][0] <= start:
+            heappush(free, heappop(busy)[1])
+        if free:
+            layer = heappop(free)
+        else:
+            layer = count
+            count += 1
+        layers[index] = base + layer
+        heappush(busy, (endTicks[index], layer))
+    return layers, count
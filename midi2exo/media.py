@@ -0,0 +1,47 @@
+from os import scandir, stat
+from os.path import exists, normcase, split
+from midi2exo.spans import profiler
+
+class MediaIndex:
+    # Names in each source folder, listed once with scandir and kept until the folder's
+    # modification time changes, so looking up a media file costs a set lookup instead of a stat
+    def __init__(self):
+        self.folders = {}
+    def scan(self, folder):
+        profiler.count('stat', 2)
+        try:
+            mtime = stat(folder).st_mtime_ns
+            with scandir(folder) as entries:
+                names = frozenset(normcase(e.name) for e in entries)
+        except OSError:
+            return None, frozenset()
+        return mtime, names
+    def listing(self, folder):
+        key = normcase(folder)
+        if key not in self.folders:
+            self.folders[key] = (folder, *self.scan(folder))
+        return self.folders[key][2]
+    def exists(self, path):
+        folder, name = split(path)
+        if not name:
+            profiler.count('stat')
+            return exists(path)
+        return normcase(name) in self.listing(folder or '.')
+    def revalidate(self):
+        # Drops folders whose modification time changed; returns whether any was dropped
+        stale = []
+        for key, (folder, mtime, _) in self.folders.items():
+            profiler.count('stat')
+            try:
+                now = stat(folder).st_mtime_ns
+            except OSError:
+                now = None
+            if now != mtime:
+                stale.append(key)
+        for key in stale:
+            del self.folders[key]
+        return bool(stale)
+    def clear(self):
+        self.folders.clear()
+
+mediaIndex = MediaIndex()
@@ -0,0 +1,52 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+# Qt model of the channel list used by the midi2exo window; like workers, not imported by the package
+class ChannelModel(QAbstractTableModel):
+    # The view only asks for the rows it shows, and rows whose channel changed are announced
+    # with dataChanged instead of every item being rebuilt
+    headers = ['状态', '编号', '音轨名称', '音符数', '素材路径']
+    disabledBrush = QBrush(QColor('#C0C0C0'))
+    existsBrush = QBrush(QColor('#009900'))
+    missingBrush = QBrush(Qt.red)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.channels = []
+    def setChannels(self, channels):
+        self.beginResetModel()
+        self.channels = channels
+        self.endResetModel()
+    def rowsChanged(self, rows):
+        # Consecutive rows are announced as one range
+        rows = sorted(rows)
+        start = 0
+        for index in range(1, len(rows) + 1):
+            if index == len(rows) or rows[index] != rows[index - 1] + 1:
+                self.dataChanged.emit(self.index(rows[start], 0), self.index(rows[index - 1], len(self.headers) - 1))
+                start = index
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.channels)
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.channels[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return '已禁用' if not i.enabled else '正常' if i.exists else '文件不存在'
+            if column == 1:
+                return str(index.row())
+            if column == 2:
+                return i.name
+            if column == 3:
+                return str(i.size())
+            return i.path
+        if role == Qt.ForegroundRole and column == 0:
+            return self.disabledBrush if not i.enabled else self.existsBrush if i.exists else self.missingBrush
+        return None
@@ -0,0 +1,73 @@
+from array import array
+from midi2exo.timing import secondsToFrames
+
+class TrackNotes:
+    # Start / end ticks of the notes read from one MIDI track
+    __slots__ = ('name', 'startTicks', 'endTicks')
+    def __init__(self, name, startTicks=None, endTicks=None):
+        self.name = name
+        self.startTicks = array('q') if startTicks is None else startTicks
+        self.endTicks = array('q') if endTicks is None else endTicks
+    def append(self, startTick, endTick):
+        self.startTicks.append(startTick)
+        self.endTicks.append(endTick)
+    def __len__(self):
+        return len(self.startTicks)
+class HeldNotes:
+    # Notes from their note-on to the matching note-off (same channel and key; the one that
+    # started first ends first) rather than to the next note-on, so chords and overlapping notes
+    # are kept. Notes still sounding when the track ends last until then; notes that end where
+    # they start are dropped
+    __slots__ = ('startTicks', 'endTicks', 'sounding')
+    def __init__(self):
+        self.startTicks, self.endTicks = array('q'), array('q')
+        self.sounding = {}
+    def noteOn(self, tick, channel, note):
+        self.sounding.setdefault((channel << 7) | note, []).append(len(self.startTicks))
+        self.startTicks.append(tick)
+        self.endTicks.append(-1)
+    def noteOff(self, tick, channel, note):
+        started = self.sounding.get((channel << 7) | note)
+        if started:
+            self.endTicks[started.pop(0)] = tick
+    def finish(self, name, endTick):
+        notes = TrackNotes(name)
+        for start, end in zip(self.startTicks, self.endTicks):
+            if end < 0:
+                end = endTick
+            if end > start:
+                notes.append(start, end)
+        return notes
+class Song:
+    # Everything the conversion needs from a MIDI file: the tracks that have notes, the tempo
+    # changes in the order they were read and the playback length in seconds (None for type 2).
+    # held tells whether the notes were read as HeldNotes
+    def __init__(self, ticksPerBeat, tempoChanges, tracks, length, held=False):
+        self.ticksPerBeat, self.tempoChanges, self.tracks, self.length = ticksPerBeat, tempoChanges, tracks, length
+        self.held = held
+
+class NoteStore:
+    # Column store of a channel's notes (start / end ticks, layer); seconds are derived
+    # from the ticks in one pass over a TempoMap by retime, and ExoVideo objects are only built on
+    # demand when an item is indexed or iterated. Unless the notes are held ones, the last note
+    # is exported lasting until the end of the song
+    __slots__ = ('startTicks', 'endTicks', 'layers', 'starts', 'ends', 'video', 'held')
+    def __init__(self, video=None, startTicks=None, endTicks=None, layers=None, held=False):
+        self.startTicks = array('q') if startTicks is None else startTicks
+        self.endTicks = array('q') if endTicks is None else endTicks
+        self.layers = array('i') if layers is None else layers
+        self.starts, self.ends = array('d'), array('d')
+        self.video = video
+        self.held = held
+    def retime(self, tempoMap):
+        self.starts = tempoMap.toSecondsArray(self.startTicks)
+        self.ends = tempoMap.toSecondsArray(self.endTicks)
+    def frames(self, rate):
+        return secondsToFrames(self.starts, self.ends, rate)
+    def __len__(self):
+        return len(self.startTicks)
+    def __getitem__(self, index):
+        return self.video(start=float(self.starts[index]), end=float(self.ends[index]), layer=self.layers[index])
+    def __iter__(self):
+        for index in range(len(self.startTicks)):
+            yield self[index]
@@ -0,0 +1,268 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from heapq import merge
+from math import log
+from mmap import mmap, ACCESS_READ
+from multiprocessing import get_context
+from os import fstat
+from struct import unpack_from
+from midi2exo.notes import HeldNotes, Song, TrackNotes
+from midi2exo.tempo import TempoMap, songLength
+
+class ScanError(Exception):
+    pass
+
+# Data bytes after each channel message status (by high nibble) and system message status
+channelSizes = {0x8: 2, 0x9: 2, 0xA: 2, 0xB: 2, 0xC: 1, 0xD: 1, 0xE: 2}
+systemSizes = {0xF1: 1, 0xF2: 2, 0xF3: 1, 0xF6: 0, 0xF8: 0, 0xFA: 0, 0xFB: 0, 0xFC: 0, 0xFE: 0}
+# Meta types mido knows; mido drops the delta time of any other meta message
+knownMeta = frozenset([0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 0x09, 0x20, 0x21, 0x2F, 0x51, 0x54, 0x58, 0x59, 0x7F])
+maxMessageLength = 1000000
+# time_signature exponents mido rejects: it checks the denominator 2**n is a power of two with
+# a float log, which is inexact for some n
+badDenominators = frozenset(n for n in range(256) if log(2 ** n, 2) != int(log(2 ** n, 2)))
+# Files smaller than this are scanned in-process; starting worker processes would cost more
+parallelBytes = 4 << 20
+
+def checkMeta(metaType, body):
+    # The meta payloads mido's decoders fail on: bodies too short for their fields, SMPTE frame
+    # rates and keys missing from its tables, and SMPTE times its attribute checks reject
+    size = len(body)
+    if metaType == 0x00:
+        if size == 1:
+            raise ScanError('sequence_number too short')
+    elif metaType == 0x20:
+        if size < 1:
+            raise ScanError('channel_prefix too short')
+    elif metaType == 0x51:
+        if size < 3:
+            raise ScanError('set_tempo too short')
+    elif metaType == 0x54:
+        if size < 5:
+            raise ScanError('smpte_offset too short')
+        if body[0] >> 5 > 3:
+            raise ScanError('invalid smpte_offset frame rate')
+        if body[1] > 59 or body[2] > 59 or body[4] > 99:
+            raise ScanError('smpte_offset out of range')
+    elif metaType == 0x58:
+        if size < 4:
+            raise ScanError('time_signature too short')
+        if body[1] in badDenominators:
+            raise ScanError('invalid time_signature denominator')
+    elif metaType == 0x59:
+        if size < 2:
+            raise ScanError('key_signature too short')
+        # key is a signed byte from -7 (7 flats) to 7 (7 sharps), mode is 0 (major) or 1 (minor)
+        if 7 < body[0] < 0xF9 or body[1] > 1:
+            raise ScanError('invalid key_signature')
+
+@contextmanager
+def mapFile(file):
+    # Maps the file read-only, so track chunks are paged in as the scanner reaches them instead of
+    # the whole file being read up front; empty files cannot be mapped and come back as bytes
+    with open(file, 'rb') as f:
+        if fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+            if hasattr(data, 'madvise'):
+                from mmap import MADV_SEQUENTIAL
+                data.madvise(MADV_SEQUENTIAL)
+            yield data
+
+def scanSong(data, progress=None, file=None, jobs=1, held=False):
+    # Reads a Standard MIDI File straight from its bytes, keeping only what extractSong keeps
+    # (note-ons, with held note-offs too, tempo changes, track names and message ticks) without
+    # building a mido Message per event. Anything mido would read differently or reject raises ScanError. Given the file
+    # data was mapped from, tracks are scanned by jobs worker processes. Errors are raised only
+    # once every view of data is gone, so a mapping can still be closed afterwards
+    error = None
+    view = memoryview(data).toreadonly().cast('B')
+    try:
+        midiType, ticksPerBeat, chunks = trackChunks(view)
+        if file is None or jobs <= 1 or len(chunks) <= 1:
+            results = scanChunks(view, chunks, progress, held)
+        else:
+            results = scanParallel(file, chunks, progress, jobs, held)
+    except (IndexError, ValueError, ScanError) as e:
+        error = str(e)
+    finally:
+        view.release()
+    if error is not None:
+        raise ScanError(error)
+    return assemble(midiType, ticksPerBeat, results, held)
+def trackChunks(data):
+    # Walks the chunk headers only, giving the (start, end) of each track's events
+    if bytes(data[:4]) != b'MThd':
+        raise ScanError('MThd not found')
+    size = unpack_from('>L', data, 4)[0]
+    if size < 6:
+        raise ScanError('header chunk too short')
+    midiType, trackCount, ticksPerBeat = unpack_from('>hhh', data, 8)
+    pos = 8 + size
+    chunks = []
+    for _ in range(trackCount):
+        if bytes(data[pos:pos + 4]) != b'MTrk':
+            raise ScanError('no MTrk header at start of track')
+        end = pos + 8 + unpack_from('>L', data, pos + 4)[0]
+        if end > len(data):
+            raise ScanError('track chunk runs past the end of the file')
+        chunks.append((pos + 8, end))
+        pos = end
+    return midiType, ticksPerBeat, chunks
+def scanChunks(data, chunks, progress, held=False):
+    results = []
+    for pos, end in chunks:
+        results.append(scanTrack(data, pos, end, held))
+        if progress:
+            progress(len(results), len(chunks))
+    return results
+def scanParallel(file, chunks, progress, jobs, held=False):
+    # Largest tracks are handed out first; results are still taken in track order, so the song
+    # is assembled exactly as the serial scan would. Workers are spawned, never forked, as this
+    # also runs from the window's loader thread
+    pool = ProcessPoolExecutor(min(jobs, len(chunks)), mp_context=get_context('spawn'))
+    try:
+        futures = [None] * len(chunks)
+        for index in sorted(range(len(chunks)), key=lambda i: chunks[i][0] - chunks[i][1]):
+            futures[index] = pool.submit(scanFileChunk, file, *chunks[index], held)
+        results = []
+        for future in futures:
+            results.append(future.result())
+            if progress:
+                progress(len(results), len(chunks))
+        return results
+    finally:
+        pool.shutdown(cancel_futures=True)
+def scanFileChunk(file, pos, end, held=False):
+    # Runs in a worker process, which maps the file for itself
+    error = None
+    with mapFile(file) as data:
+        view = memoryview(data).cast('B')
+        try:
+            result = scanTrack(view, pos, end, held)
+        except (IndexError, ValueError, ScanError) as e:
+            error = str(e)
+        finally:
+            view.release()
+    if error is not None:
+        raise ScanError(error)
+    return result
+def assemble(midiType, ticksPerBeat, results, held=False):
+    tracks, changes, trackTicks = [], [], []
+    endTick = 0
+    for notes, trackChanges, ticks, nowPosition in results:
+        if notes is not None:
+            tracks.append(notes)
+        changes.extend(trackChanges)
+        trackTicks.append(ticks)
+        endTick = max(endTick, nowPosition)
+    length = None
+    if midiType != 2:
+        length = songLength(merge(*trackTicks), endTick, TempoMap(ticksPerBeat, changes))
+    return Song(ticksPerBeat, changes, tracks, length, held)
+def scanTrack(data, pos, end, held=False):
+    # Scans one track chunk; returns its notes (None without note-ons), its tempo changes, the
+    # distinct ticks its messages fall on in order, and the tick it ends on. The ticks grow with
+    # the track's events, not its notes: songLength needs every one to match mido's float sum
+    notes, name, changes = None, None, []
+    sounding = HeldNotes() if held else None
+    ticks = array('q')
+    nowPosition, lastTick, lastStart, lastStatus = 0, None, None, None
+    while pos < end:
+        delta = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            delta = (delta << 7) | (byte & 0x7F)
+            if byte < 0x80:
+                break
+        nowPosition += delta
+        status = data[pos]
+        if status < 0x80:
+            # running status; the byte read is the first data byte
+            if lastStatus is None or lastStatus >= 0xF0:
+                raise ScanError('unsupported running status')
+            status = lastStatus
+        else:
+            pos += 1
+            if status != 0xFF:
+                lastStatus = status
+        if status == 0xFF:
+            metaType = data[pos]
+            pos += 1
+            length = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                length = (length << 7) | (byte & 0x7F)
+                if byte < 0x80:
+                    break
+            if length > maxMessageLength:
+                raise ScanError('message too long')
+            body = data[pos:pos + length]
+            pos += length
+            if metaType not in knownMeta:
+                nowPosition -= delta
+            if metaType == 0x2F:
+                if pos > end:
+                    raise ScanError('message runs past the end of the track')
+                continue
+            checkMeta(metaType, body)
+            if metaType == 0x51:
+                changes.append((nowPosition, (body[0] << 16) | (body[1] << 8) | body[2]))
+            elif metaType == 0x03 and name is None:
+                name = bytes(body).decode('latin1')
+        elif status == 0xF0 or status == 0xF7:
+            length = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                length = (length << 7) | (byte & 0x7F)
+                if byte < 0x80:
+                    break
+            if length > maxMessageLength:
+                raise ScanError('message too long')
+            body = bytes(data[pos:pos + length])
+            pos += length
+            if body[:1] == b'\xf0':
+                body = body[1:]
+            if body[-1:] == b'\xf7':
+                body = body[:-1]
+            if body and max(body) > 0x7F:
+                raise ScanError('sysex data byte out of range')
+        else:
+            size = channelSizes.get(status >> 4) if status < 0xF0 else systemSizes.get(status)
+            if size is None:
+                raise ScanError('undefined status byte 0x{0:02x}'.format(status))
+            if size:
+                first = data[pos]
+                second = data[pos + 1] if size == 2 else 0
+                pos += size
+                if first > 0x7F or second > 0x7F:
+                    raise ScanError('data byte must be in range 0..127')
+                if sounding is not None:
+                    if status >> 4 == 0x9 and second:
+                        sounding.noteOn(nowPosition, status & 0xF, first)
+                    elif status >> 4 == 0x8 or status >> 4 == 0x9:
+                        sounding.noteOff(nowPosition, status & 0xF, first)
+                elif status >> 4 == 0x9 and second:
+                    if notes is None:
+                        notes = TrackNotes(None)
+                    if lastStart != nowPosition:
+                        if lastStart is not None:
+                            notes.append(lastStart, nowPosition)
+                        lastStart = nowPosition
+        if pos > end:
+            raise ScanError('message runs past the end of the track')
+        if nowPosition != lastTick:
+            ticks.append(nowPosition)
+            lastTick = nowPosition
+    if lastStart is not None:
+        notes.append(lastStart, nowPosition)
+    if sounding is not None and sounding.startTicks:
+        notes = sounding.finish(None, nowPosition)
+    if notes is not None:
+        notes.name = name or ''
+    return notes, changes, ticks, nowPosition
@@ -0,0 +1,125 @@
+from array import array
+from hashlib import blake2b
+from os import environ, getpid, listdir, makedirs, remove, replace, stat, utime
+from os.path import expanduser, join
+from struct import Struct, error as StructError
+from sys import byteorder
+from midi2exo.notes import Song, TrackNotes
+
+header = Struct('<4sBIdI')
+tempoChange = Struct('<qI')
+count = Struct('<I')
+magic = b'M2XS'
+noLength = float('nan')
+# Size of each cache folder as this process last counted it plus what it has written since, so
+# put only lists the folder once it may have outgrown maxBytes (a listing also picks up what
+# other processes wrote)
+knownBytes = {}
+
+def defaultCacheDir():
+    return join(environ.get('XDG_CACHE_HOME') or expanduser('~/.cache'), 'midi2exo')
+
+def packSong(song):
+    length = noLength if song.length is None else song.length
+    parts = [header.pack(magic, byteorder == 'little', song.ticksPerBeat, length, len(song.tempoChanges))]
+    parts.extend(tempoChange.pack(tick, tempo) for tick, tempo in song.tempoChanges)
+    parts.append(count.pack(len(song.tracks)))
+    for track in song.tracks:
+        name = track.name.encode('utf-8', 'surrogatepass')
+        parts.append(count.pack(len(name)))
+        parts.append(name)
+        parts.append(count.pack(len(track)))
+        parts.append(track.startTicks.tobytes())
+        parts.append(track.endTicks.tobytes())
+    return b''.join(parts)
+def unpackSong(data):
+    view = memoryview(data)
+    mark, little, ticksPerBeat, length, tempos = header.unpack_from(view)
+    if mark != magic or little != (byteorder == 'little'):
+        raise ValueError('not a midi2exo song cache entry')
+    pos = header.size
+    changes = []
+    for _ in range(tempos):
+        changes.append(tempoChange.unpack_from(view, pos))
+        pos += tempoChange.size
+    def readCount():
+        nonlocal pos
+        pos += count.size
+        return count.unpack_from(view, pos - count.size)[0]
+    def readBytes(size):
+        nonlocal pos
+        pos += size
+        if pos > len(view):
+            raise ValueError('truncated midi2exo song cache entry')
+        return view[pos - size:pos]
+    tracks = []
+    for _ in range(readCount()):
+        name = bytes(readBytes(readCount())).decode('utf-8', 'surrogatepass')
+        notes = readCount()
+        startTicks, endTicks = array('q'), array('q')
+        startTicks.frombytes(readBytes(notes * startTicks.itemsize))
+        endTicks.frombytes(readBytes(notes * endTicks.itemsize))
+        tracks.append(TrackNotes(name, startTicks, endTicks))
+    return Song(ticksPerBeat, changes, tracks, None if length != length else length)
+
+class SongCache:
+    # Songs extracted from MIDI files, stored under the hash of the file's contents and the
+    # parser version; the least recently used entries are removed once the folder outgrows maxBytes
+    def __init__(self, folder=None, maxBytes=256<<20):
+        self.folder = folder or defaultCacheDir()
+        self.maxBytes = maxBytes
+    def key(self, data, version):
+        return '{0}-{1}'.format(blake2b(data, digest_size=20).hexdigest(), version)
+    def path(self, key):
+        return join(self.folder, key + '.song')
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                song = unpackSong(f.read())
+            utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, StructError):
+            self.drop(path)
+            return None
+        return song
+    def put(self, key, song):
+        path = self.path(key)
+        tmpPath = '{0}.{1}.tmp'.format(path, getpid())
+        data = packSong(song)
+        try:
+            makedirs(self.folder, exist_ok=True)
+            with open(tmpPath, 'wb') as f:
+                f.write(data)
+            replace(tmpPath, path)
+        except OSError:
+            self.drop(tmpPath)
+            return
+        total = knownBytes.get(self.folder)
+        if total is None or total + len(data) > self.maxBytes:
+            self.evict()
+        else:
+            knownBytes[self.folder] = total + len(data)
+    def drop(self, path):
+        try:
+            remove(path)
+        except OSError:
+            pass
+    def evict(self):
+        entries = []
+        for name in listdir(self.folder):
+            if not name.endswith('.song'):
+                continue
+            try:
+                info = stat(join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            self.drop(join(self.folder, name))
+            total -= size
+        knownBytes[self.folder] = total
@@ -0,0 +1,73 @@
+from contextlib import contextmanager
+from json import dump
+from threading import local
+from time import perf_counter
+
+class Profiler:
+    # Wall time of each pipeline stage and a few counters, gathered only while enabled. Spans
+    # are wrapped around whole stages, never single notes, so leaving it enabled costs nothing
+    # noticeable; nested spans are keyed by their path, e.g. 'save/write'
+    names = {'load': '读取', 'resolve': '查找素材', 'retime': '计算时间', 'save': '导出'}
+    counterNames = {'notes': '音符', 'objects': '对象', 'reused': '复用通道', 'bytes': '字节', 'stat': '文件系统调用'}
+    def __init__(self):
+        self.enabled = False
+        self.local = local()
+        self.spans, self.counters = {}, {}
+    def start(self):
+        self.clear()
+        self.enabled = True
+    def stop(self):
+        self.enabled = False
+    def clear(self):
+        self.spans, self.counters = {}, {}
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(name)
+        # registered on entry so that stages are listed before the stages nested in them
+        entry = self.spans.setdefault('/'.join(stack), [0.0, 0])
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - begin
+            stack.pop()
+            entry[0] += seconds
+            entry[1] += 1
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+    def report(self):
+        return {
+            'spans': dict((key, {'seconds': seconds, 'calls': calls}) for key, (seconds, calls) in self.spans.items()),
+            'counters': dict(self.counters),
+        }
+    def merge(self, report):
+        # Adds a report from another process (see convertMany)
+        for key, value in report['spans'].items():
+            entry = self.spans.setdefault(key, [0.0, 0])
+            entry[0] += value['seconds']
+            entry[1] += value['calls']
+        for name, value in report['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            dump(self.report(), f, indent=2)
+    def format(self):
+        lines = ['{0:24} {1:>10} {2:>8}'.format('阶段', '秒', '次数')]
+        for key, (seconds, calls) in self.spans.items():
+            depth = key.count('/')
+            lines.append('{0:24} {1:10.4f} {2:8}'.format('  ' * depth + key.rsplit('/', 1)[-1], seconds, calls))
+        for name, value in self.counters.items():
+            lines.append('{0:24} {1:>19,}'.format(self.counterNames.get(name, name), value))
+        return '\n'.join(lines)
+    def summary(self):
+        # One line for a status bar: top-level stages and the counters
+        parts = ['{0} {1:.3f} 秒'.format(self.names.get(key, key), seconds) for key, (seconds, _) in self.spans.items() if '/' not in key]
+        parts.extend('{0} {1:,}'.format(self.counterNames.get(name, name), value) for name, value in self.counters.items())
+        return '，'.join(parts)
+
+profiler = Profiler()
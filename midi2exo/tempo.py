@@ -0,0 +1,56 @@
+from array import array
+from bisect import bisect_right
+from itertools import chain
+from midi2exo.timing import numpy, tickScale
+
+defaultTempo = 500000
+
+class TempoMap:
+    # Tempo changes of a whole file with the seconds elapsed at each of them, so that
+    # any tick converts to seconds with one binary search
+    def __init__(self, ticksPerBeat, changes=(), initial=defaultTempo):
+        changes = list(changes)
+        self.ticksPerBeat = ticksPerBeat
+        # tempo of the last set_tempo event read, shown as the file's BPM
+        self.fileTempo = changes[-1][1] if changes else None
+        self.ticks, self.tempos, self.seconds = array('q', [0]), [initial], array('d', [0.0])
+        for tick, tempo in sorted(changes, key=lambda change: change[0]):
+            if tick == self.ticks[-1]:
+                # a later change on the same tick replaces the earlier one
+                self.tempos[-1] = tempo
+                continue
+            self.seconds.append(self.seconds[-1] + (tick - self.ticks[-1]) * tickScale(ticksPerBeat, self.tempos[-1]))
+            self.ticks.append(tick)
+            self.tempos.append(tempo)
+        self.scales = array('d', [tickScale(ticksPerBeat, t) for t in self.tempos])
+    def __len__(self):
+        return len(self.tempos)
+    def toSeconds(self, tick):
+        i = bisect_right(self.ticks, tick) - 1
+        return self.seconds[i] + (tick - self.ticks[i]) * self.scales[i]
+    def toSecondsArray(self, ticks):
+        if numpy is None:
+            return array('d', [self.toSeconds(t) for t in ticks])
+        ticks = numpy.frombuffer(ticks, dtype=numpy.int64) if isinstance(ticks, array) else numpy.asarray(ticks, dtype=numpy.int64)
+        if len(self.tempos) == 1:
+            return ticks * self.scales[0]
+        marks = numpy.frombuffer(self.ticks, dtype=numpy.int64)
+        i = numpy.searchsorted(marks, ticks, side='right') - 1
+        return numpy.frombuffer(self.seconds)[i] + (ticks - marks[i]) * numpy.frombuffer(self.scales)[i]
+    def override(self, tempo):
+        return TempoMap(self.ticksPerBeat, initial=tempo)
+
+def songLength(ticks, endTick, tempoMap):
+    # Adds up the same per-message deltas in the same order as mido's MidiFile.length, so the
+    # result is identical without merging every track: ticks are the sorted distinct ticks of
+    # all messages except end_of_track, endTick the tick the longest track ends on
+    length, prev, i = 0, 0, 0
+    marks, scales = tempoMap.ticks, tempoMap.scales
+    for tick in chain(ticks, (endTick,)):
+        if tick <= prev:
+            continue
+        while i + 1 < len(marks) and marks[i + 1] <= prev:
+            i += 1
+        length += (tick - prev) * scales[i]
+        prev = tick
+    return length
@@ -0,0 +1,14 @@
+from math import ceil
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Same arithmetic as mido.tick2second
+def tickScale(ticksPerBeat, tempo):
+    return tempo * 1e-6 / ticksPerBeat
+# Frame numbers as exported: 1 + ceil(start * rate) and ceil(end * rate)
+def secondsToFrames(starts, ends, rate):
+    if numpy is not None:
+        return (numpy.ceil(numpy.asarray(starts) * rate).astype(numpy.int64) + 1).tolist(), numpy.ceil(numpy.asarray(ends) * rate).astype(numpy.int64).tolist()
+    return [1 + ceil(s * rate) for s in starts], [ceil(e * rate) for e in ends]
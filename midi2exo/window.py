@@ -0,0 +1,429 @@
+from mido import tempo2bpm, bpm2tempo
+from os.path import normpath, expanduser
+from sys import argv
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QAction, QApplication, QCheckBox, QFileDialog, QGroupBox, QHBoxLayout, QLabel, QLineEdit, QMainWindow, QMessageBox, QProgressDialog, QPushButton, QTreeView, QVBoxLayout, QWidget
+from PyQt5.QtGui import QIcon, QTextFormat
+from PyQt5.Qt import Qt, QIntValidator, QRegularExpressionValidator, QRegularExpression
+from PyQt5.QtCore import QEvent, QObject
+from midi2exo import version
+from midi2exo.core import ExoCache, Project, retimeChannels, refreshChannels, anyNonExist
+from midi2exo.models import ChannelModel
+from midi2exo.songcache import SongCache
+from midi2exo.spans import profiler
+from midi2exo.workers import MidiLoader, ExoExporter
+from pyaviutl.dialects import dialects
+
+class DropFileHandler(QObject):    
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.DragEnter:
+            event.accept()
+        elif event.type() == QEvent.Drop:
+            mime = event.mimeData()
+            if mime.hasUrls():
+                watched.setText(normpath(event.mimeData().urls()[0].toLocalFile()))
+                return True
+        return super().eventFilter(watched, event)
+class MenuItem:
+    def __init__(self, parent, name, tip=None, target=None, shortcut=None):
+        self.name = name
+        self.action = QAction(name, parent)
+        if shortcut is not None:
+            self.action.setShortcut(shortcut)
+        if tip is not None:
+            self.action.setStatusTip(tip)
+        if target is not None:
+            self.action.triggered.connect(target)
+
+class Midi2ExoMain(QMainWindow):
+    titlePref = 'midi2exo v{0}'.format(version)
+    nowChl = -1
+    # One window for every AviUtl version; midi2exo_116d.py / midi2exo_117b.py only pick the dialect
+    def __init__(self, dialect='117b'):
+        super().__init__()
+        self.dialect = dialects[dialect]
+        self.menu = {
+            '文件': [
+                MenuItem(self, '打开', '打开 MIDI 文件', self.open, 'Ctrl+O'),
+                MenuItem(self, '导出 EXO', '导出 EXO 文件', self.save, 'Ctrl+S'),
+                MenuItem(self, '追加到 EXO', '将音符追加到已有 EXO 文件中的对象之后', self.saveAppend, 'Ctrl+Shift+S'),
+                MenuItem(self, '|'),
+                MenuItem(self, '退出', '退出本应用程序', self.close, 'Alt+F4')
+            ],
+            '帮助': [MenuItem(self, '关于', '关于本程序', self.about)]
+        }
+        self.file = ''
+        self.bpm = None
+        self.channels = []
+        self.loader = None
+        self.exoCache = ExoCache()
+        self.songCache = SongCache()
+        # timings of the last load / export are shown in the status bar
+        profiler.start()
+        self.setAcceptDrops(True)
+        QApplication.instance().focusChanged.connect(self.onFocusChanged)
+        self.render()
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.accept()
+        else:
+            event.ignore()
+    def dropEvent(self, event):
+        files = [u.toLocalFile() for u in event.mimeData().urls()]
+        if len(files) != 0:
+            self.handleMidi(files[0])
+    def about(self):
+        msgBox = QMessageBox(self)
+        msgBox.setIcon(QMessageBox.Information)
+        msgBox.setWindowTitle('关于')
+        msgBox.setText('''
+            <center>
+                <h3>midi2exo</h3>
+                <font color=grey align=left>
+                    <div>版本：v{0}</div>
+                    <div>作者：xszqxszq</div>
+                    <div>适用：{1}</div>
+                </font>
+            </center>'''.format(version, self.dialect.label))
+        msgBox.setTextFormat(Qt.RichText)
+        msgBox.setInformativeText('本程序可以利用 MIDI 文件生成 exo 文件，以减轻在 AviUtl 中音乐相关剪辑（如音MAD）的工作量。')
+        aboutQt = msgBox.addButton('关于 Qt', QMessageBox.ActionRole)
+        msgBox.addButton(QMessageBox.Ok)
+        msgBox.exec_()
+        if msgBox.clickedButton() == aboutQt:
+            QMessageBox.aboutQt(self, '关于 Qt')
+    def open(self):
+        file, _ = QFileDialog.getOpenFileName(self, '打开 MIDI 文件', filter='MIDI 文件 (*.mid)')
+        if file:
+            self.handleMidi(file)
+    def setDefSrcPath(self):
+        path = QFileDialog.getExistingDirectory(self, '选择素材默认存放文件夹', self.defSrcPathLE.text())
+        if path != '':
+            self.defSrcPathLE.setText(normpath(path))
+    def setNowSrcPath(self):
+        path, _ = QFileDialog.getOpenFileName(self, '选择素材文件', self.nowSrcPathLE.text())
+        if path != '':
+            self.nowSrcPathLE.setText(normpath(path))
+    def handleMidi(self, file):
+        # Parsing runs in a worker thread; the result is applied in one go by onMidiLoaded
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loadProgress.close()
+        self.loader = MidiLoader(file, self.project(), self.songCache, self)
+        self.loadProgress = QProgressDialog('正在读取 MIDI 文件……', '取消', 0, 0, self)
+        self.loadProgress.setWindowTitle('读取 MIDI')
+        self.loadProgress.setWindowModality(Qt.WindowModal)
+        self.loadProgress.setMinimumDuration(300)
+        self.loadProgress.canceled.connect(self.loader.requestInterruption)
+        self.loader.progress.connect(self.onLoadProgress)
+        self.loader.loaded.connect(self.onMidiLoaded)
+        self.loader.failed.connect(self.onLoadFailed)
+        self.loader.finished.connect(self.loadProgress.reset)
+        profiler.clear()
+        self.loader.start()
+    @QtCore.pyqtSlot(int, int)
+    def onLoadProgress(self, done, total):
+        if self.sender() is not self.loader:
+            return
+        self.loadProgress.setLabelText('正在处理音轨 {0} / {1}'.format(done, total))
+        self.loadProgress.setMaximum(total)
+        self.loadProgress.setValue(done)
+    @QtCore.pyqtSlot(str)
+    def onLoadFailed(self, message):
+        if self.sender() is not self.loader:
+            return
+        QMessageBox.critical(self, '错误', message)
+    @QtCore.pyqtSlot(object)
+    def onMidiLoaded(self, result):
+        if self.sender() is not self.loader:
+            return
+        file, self.song, channels, self.tempoMap = result
+        fileBpm = None if self.tempoMap.fileTempo is None else round(tempo2bpm(self.tempoMap.fileTempo), 2)
+        # The open file read again (see onHeldChanged) keeps the channel edits and BPM set for it
+        reload = file == self.file and [ch.name for ch in channels] == [ch.name for ch in self.channels]
+        if reload:
+            for new, old in zip(channels, self.channels):
+                new.keepEdits(old)
+        self.file, self.channels = file, channels
+        if reload and self.bpm is not None and self.bpm != fileBpm:
+            retimeChannels(self.channels, self.tempoMap.override(bpm2tempo(self.bpm)))
+        else:
+            self.bpm = fileBpm
+            if fileBpm is not None:
+                self.bpmLE.setText(str(fileBpm))
+        self.nowChl = -1
+        refreshChannels(self.channels, self.project())
+        self.renderList()
+        self.setWindowTitle('{0} - {1}'.format(self.titlePref, self.file))
+        self.chlLstWid.clearSelection()
+        self.statusBar().showMessage(profiler.summary())
+    def project(self):
+        return Project(srcPath=self.defSrcPathLE.text(), ext=self.extLE.text(), alpha=self.defAlpha.checkState(), flip=self.defFlip.checkState(), dialect=self.dialect.name, held=self.defHeld.isChecked())
+    def save(self):
+        self.export(False)
+    def saveAppend(self):
+        self.export(True)
+    def export(self, append):
+        self.refresh(True)
+        if anyNonExist(self.channels):
+            reply = QMessageBox.warning(self, '警告', '有轨道的素材文件不存在，这可能导致exo文件在导入时会不断报错，是否仍要导出？', QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.No:
+                return
+        if append:
+            path, _ = QFileDialog.getOpenFileName(self, '追加到 EXO 文件', filter='EXO 文件 (*.exo)')
+        else:
+            path, _ = QFileDialog.getSaveFileName(self, '导出 EXO 文件', filter='EXO 文件 (*.exo)')
+        if not path:
+            return
+        project = self.project()
+        project.width, project.height = int(self.geomWLE.text()), int(self.geomHLE.text())
+        project.rate, project.audioRate = int(self.fps.text()), int(self.sr.text())
+        # Exporting runs in a worker thread; the existing file is only replaced when it succeeds
+        self.exporter = ExoExporter(path, self.song, self.channels, project, self.exoCache, self, append)
+        self.saveProgress = QProgressDialog('正在导出 EXO 文件……', '取消', 0, 0, self)
+        self.saveProgress.setWindowTitle('导出 EXO')
+        self.saveProgress.setWindowModality(Qt.WindowModal)
+        self.saveProgress.setMinimumDuration(300)
+        self.saveProgress.canceled.connect(self.exporter.requestInterruption)
+        self.exporter.progress.connect(self.onSaveProgress)
+        self.exporter.saved.connect(self.onSaved)
+        self.exporter.failed.connect(self.onSaveFailed)
+        self.exporter.finished.connect(self.saveProgress.reset)
+        profiler.clear()
+        self.exporter.start()
+    @QtCore.pyqtSlot(int, int)
+    def onSaveProgress(self, done, total):
+        self.saveProgress.setMaximum(total)
+        self.saveProgress.setValue(done)
+    @QtCore.pyqtSlot(str)
+    def onSaved(self, path):
+        self.saveProgress.reset()
+        self.statusBar().showMessage(profiler.summary())
+        QMessageBox.information(self, '导出完毕', 'EXO 文件已成功导出。')
+    @QtCore.pyqtSlot(str)
+    def onSaveFailed(self, message):
+        self.saveProgress.reset()
+        QMessageBox.critical(self, '错误', message)
+    def refresh(self, force=False):
+        changed = refreshChannels(self.channels, self.project(), force)
+        if changed:
+            self.renderItem(*changed)
+    def renderItem(self, *rows):
+        self.chlModel.rowsChanged(rows)
+        self.resizeColumns()
+    def resizeColumns(self, fit=False):
+        # Only the rows on screen are measured (see setResizeContentsPrecision); columns only grow
+        # unless fit is set, so scrolling to or changing a row never shrinks them
+        for i in range(self.chlModel.columnCount()):
+            width = self.chlLstWid.sizeHintForColumn(i)
+            if not fit:
+                width = max(width, self.chlLstWid.columnWidth(i))
+            self.chlLstWid.setColumnWidth(i, width)
+    def renderList(self):
+        self.chlModel.setChannels(self.channels)
+        self.resizeColumns(True)
+        self.propGrp.setEnabled(self.nowChl != -1)
+    def render(self):
+        # Basic window properties
+        self.setWindowTitle(self.titlePref)   
+        # Show status bar
+        self.statusBar()
+        # Show menu
+        menuBar = self.menuBar()
+        for name, column in self.menu.items():
+            menu = menuBar.addMenu('&' + name)
+            for i in column:
+                if i.name == '|':
+                    menu.addSeparator()
+                else:
+                    menu.addAction(i.action)
+        # Show workspace
+        prjPropGrp = QGroupBox('工程设置', self)
+        prjPropGrpLyt = QVBoxLayout()
+        geomLyt = QHBoxLayout()
+        self.geomWLE = QLineEdit(prjPropGrp)
+        self.geomHLE = QLineEdit(prjPropGrp)
+        self.fps = QLineEdit(prjPropGrp)
+        self.sr = QLineEdit(prjPropGrp)
+        self.extLE = QLineEdit(prjPropGrp)
+        self.bpmLE = QLineEdit(prjPropGrp)
+        self.geomWLE.setText('1920')
+        self.geomHLE.setText('1080')
+        self.fps.setText('60')
+        self.sr.setText('48000')
+        self.extLE.setText('mp4')
+        self.geomWLE.setValidator(QIntValidator(1, 100000, self))
+        self.geomHLE.setValidator(QIntValidator(1, 100000, self))
+        self.fps.setValidator(QIntValidator(1, 10000, self))
+        self.sr.setValidator(QIntValidator(0, 22579200, self))
+        self.extLE.setValidator(QRegularExpressionValidator(QRegularExpression('^[a-zA-Z0-9]*$')))
+        self.bpmLE.setValidator(QRegularExpressionValidator(QRegularExpression('^[0-9]*$')))
+        self.geomWLE.setFixedWidth(40)
+        self.geomHLE.setFixedWidth(40)
+        self.fps.setFixedWidth(40)
+        self.sr.setFixedWidth(40)
+        self.extLE.setFixedWidth(40)
+        geomLyt.addWidget(QLabel('图像大小'))
+        geomLyt.addWidget(self.geomWLE)
+        geomLyt.addWidget(QLabel('×'))
+        geomLyt.addWidget(self.geomHLE)
+        geomLyt.addStretch()
+        geomLyt.addWidget(QLabel('帧速率'))
+        geomLyt.addWidget(self.fps)
+        geomLyt.addStretch()
+        geomLyt.addWidget(QLabel('音频采样率'))
+        geomLyt.addWidget(self.sr)
+        srcLyt = QHBoxLayout()
+        srcLyt.addWidget(QLabel('首选素材扩展名'))
+        srcLyt.addWidget(self.extLE)
+        srcLyt.addStretch()
+        srcLyt.addWidget(QLabel('BPM'))
+        srcLyt.addWidget(self.bpmLE)
+        srcLyt.addStretch()
+        defSrcSel = QHBoxLayout()
+        defSrcSel.addWidget(QLabel('默认素材位置'))
+        self.defSrcPathLE = QLineEdit(prjPropGrp)
+        self.defSrcPathLE.setText(normpath(expanduser("~/Desktop")))
+        self.defSrcPathLE.installEventFilter(DropFileHandler(self))
+        defSrcSel.addWidget(self.defSrcPathLE)
+        defSrcSelBtn = QPushButton('...')
+        defSrcSelBtn.clicked.connect(self.setDefSrcPath)
+        defSrcSel.addWidget(defSrcSelBtn)
+        defChkLyt = QHBoxLayout()
+        self.defAlpha = QCheckBox('默认导入Alpha通道', prjPropGrp)
+        self.defFlip = QCheckBox('默认启用左右翻转', prjPropGrp)
+        self.defFlip.setCheckState(2)
+        self.defHeld = QCheckBox('保留和弦与重叠音符', prjPropGrp)
+        self.defHeld.setToolTip('音符按 note_off 计算长度，同一音轨同时发声的音符自动分配到不同图层')
+        self.defHeld.stateChanged.connect(self.onHeldChanged)
+        defApplyBtn = QPushButton('应用')
+        defApplyBtn.clicked.connect(self.apply)
+        defChkLyt.addWidget(self.defAlpha)
+        defChkLyt.addWidget(self.defFlip)
+        defChkLyt.addWidget(self.defHeld)
+        defChkLyt.addStretch()
+        defChkLyt.addWidget(defApplyBtn)
+        prjPropGrpLyt.addLayout(defSrcSel)
+        prjPropGrpLyt.addLayout(geomLyt)
+        prjPropGrpLyt.addLayout(srcLyt)
+        prjPropGrpLyt.addLayout(defChkLyt)
+        prjPropGrp.setLayout(prjPropGrpLyt)
+
+        lstGrp = QGroupBox('轨道列表', self)
+        lstGrpLyt = QVBoxLayout()
+        self.chlModel = ChannelModel(self)
+        self.chlLstWid = QTreeView(self)
+        self.chlLstWid.setModel(self.chlModel)
+        self.chlLstWid.setRootIsDecorated(False)
+        self.chlLstWid.setUniformRowHeights(True)
+        self.chlLstWid.header().setResizeContentsPrecision(0)
+        self.chlLstWid.verticalScrollBar().valueChanged.connect(lambda _: self.resizeColumns())
+        lstGrpLyt.addWidget(self.chlLstWid)
+        lstGrp.setLayout(lstGrpLyt)
+        self.chlLstWid.clicked.connect(self.onItemClicked)
+
+        self.propGrp = QGroupBox('轨道设置', self)
+        propGrpLyt = QVBoxLayout()
+        infoLyt = QHBoxLayout()
+        self.nowChlLE = QLineEdit(self.propGrp)
+        self.nowChlLE.setReadOnly(True)
+        infoLyt.addWidget(QLabel('音轨名称'))
+        infoLyt.addWidget(self.nowChlLE)
+        infoLyt.addStretch()
+        self.nowState = QCheckBox('启用轨道')
+        self.nowState.stateChanged.connect(self.onStateChanged)
+        srcSel = QHBoxLayout()
+        srcSel.addWidget(QLabel('素材路径'))
+        self.nowSrcPathLE = QLineEdit(self.propGrp)
+        self.nowSrcPathLE.textChanged.connect(self.onPathChanged)
+        self.nowSrcPathLE.installEventFilter(DropFileHandler(self))
+        srcSel.addWidget(self.nowSrcPathLE)
+        srcSelBtn = QPushButton('...')
+        srcSelBtn.clicked.connect(self.setNowSrcPath)
+        srcSel.addWidget(srcSelBtn)
+        chkLyt = QHBoxLayout()
+        self.nowAlpha = QCheckBox('导入Alpha通道', self.propGrp)
+        self.nowAlpha.stateChanged.connect(self.onAlphaChanged)
+        self.nowFlip = QCheckBox('启用左右翻转', self.propGrp)
+        self.nowFlip.stateChanged.connect(self.onFlipChanged)
+        chkLyt.addWidget(self.nowAlpha)
+        chkLyt.addWidget(self.nowFlip)
+        propGrpLyt.addLayout(infoLyt)
+        propGrpLyt.addWidget(self.nowState)
+        propGrpLyt.addLayout(srcSel)
+        propGrpLyt.addLayout(chkLyt)
+        propGrpLyt.addStretch()
+        self.propGrp.setLayout(propGrpLyt)
+
+        chlUtls = QHBoxLayout()
+        chlUtls.addWidget(lstGrp)
+        chlUtls.addWidget(self.propGrp)
+        
+        mainLyt = QVBoxLayout()
+        mainLyt.addWidget(prjPropGrp)
+        mainLyt.addLayout(chlUtls)
+        wid = QWidget(self)
+        self.setCentralWidget(wid)
+        wid.setLayout(mainLyt)
+
+        self.renderList()
+        self.show()
+
+    def apply(self):
+        for i in self.channels:
+            if i.auto:
+                i.alpha = self.defAlpha.checkState()
+                i.flip = self.defFlip.checkState()
+        if self.bpmLE.text() != '' and self.channels:
+            nowBPM = float(self.bpmLE.text())
+            if self.bpm != nowBPM:
+                self.bpm = nowBPM
+                retimeChannels(self.channels, self.tempoMap.override(bpm2tempo(nowBPM)))
+        self.refresh(True)
+    @QtCore.pyqtSlot()
+    def onFocusChanged(self):
+        self.refresh()
+    @QtCore.pyqtSlot(QtCore.QModelIndex)
+    def onItemClicked(self, index):
+        self.nowChl = index.row()
+        self.propGrp.setEnabled(True)
+        self.nowChlLE.setText(self.channels[self.nowChl].name)
+        self.nowSrcPathLE.setText(self.channels[self.nowChl].path)
+        self.nowAlpha.setCheckState(self.channels[self.nowChl].alpha)
+        self.nowFlip.setCheckState(self.channels[self.nowChl].flip)
+        self.nowState.setCheckState(self.channels[self.nowChl].enabled * 2)
+    @QtCore.pyqtSlot(str)
+    def onPathChanged(self, new):
+        if self.nowChl == -1 or self.channels[self.nowChl].path == new:
+            return
+        self.channels[self.nowChl].path = new
+        self.channels[self.nowChl].clearAuto()
+        self.refresh()
+    @QtCore.pyqtSlot(int)
+    def onAlphaChanged(self, new):
+        if self.nowChl == -1 or self.channels[self.nowChl].alpha == new:
+            return
+        self.channels[self.nowChl].alpha = new
+        self.channels[self.nowChl].clearAuto()
+    @QtCore.pyqtSlot(int)
+    def onFlipChanged(self, new):
+        if self.nowChl == -1 or self.channels[self.nowChl].flip == new:
+            return
+        self.channels[self.nowChl].flip = new
+        self.channels[self.nowChl].clearAuto()
+    @QtCore.pyqtSlot(int)
+    def onStateChanged(self, new):
+        if self.nowChl == -1:
+            return
+        self.channels[self.nowChl].enabled = new == 2
+        self.renderItem(self.nowChl)
+        self.refresh()
+    @QtCore.pyqtSlot(int)
+    def onHeldChanged(self, new):
+        # Held notes are read differently, so the open file is read again
+        if self.file:
+            self.handleMidi(self.file)
+def main(dialect):
+    app = QApplication(argv)
+    ex = Midi2ExoMain(dialect)
+    return app.exec_()
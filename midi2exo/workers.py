@@ -0,0 +1,52 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+from midi2exo.core import Cancelled, loadSong, handleMidi, saveExo, appendExo
+
+# Qt workers used by the midi2exo window; the rest of the package does not import PyQt5
+class MidiLoader(QThread):
+    progress = pyqtSignal(int, int)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    def __init__(self, file, project, cache=None, parent=None):
+        super().__init__(parent)
+        self.file, self.project, self.cache = file, project, cache
+    def report(self, done, total):
+        if self.isInterruptionRequested():
+            raise Cancelled()
+        self.progress.emit(done, total)
+    def run(self):
+        try:
+            song = loadSong(self.file, progress=self.report, cache=self.cache, held=self.project.held)
+            # paths are looked up by refreshChannels on the GUI thread (see onMidiLoaded)
+            channels, tempoMap = handleMidi(song, self.project, resolve=False)
+        except Cancelled:
+            return
+        except Exception:
+            self.failed.emit('文件无法读取，该文件可能不是midi文件')
+            return
+        # Everything is handed back at once so the track list is only filled once
+        self.loaded.emit((self.file, song, channels, tempoMap))
+class ExoExporter(QThread):
+    progress = pyqtSignal(int, int)
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    # With append set the objects are added to the existing exo at path (see appendExo)
+    def __init__(self, path, song, channels, project, cache=None, parent=None, append=False):
+        super().__init__(parent)
+        self.path, self.song, self.channels, self.project, self.cache = path, song, channels, project, cache
+        self.append = append
+    def report(self, done, total):
+        if self.isInterruptionRequested():
+            raise Cancelled()
+        self.progress.emit(done, total)
+    def run(self):
+        try:
+            if self.append:
+                appendExo(self.path, self.song, self.channels, self.project, progress=self.report)
+            else:
+                saveExo(self.path, self.song, self.channels, self.project, progress=self.report, cache=self.cache)
+        except Cancelled:
+            return
+        except Exception as e:
+            self.failed.emit('EXO 文件导出失败：{0}'.format(e))
+            return
+        self.saved.emit(self.path)
@@ -0,0 +1,23 @@
+from os import linesep
+from pyaviutl import exo, exo117b
+from pyaviutl.template import ObjectTemplate
+
+class Dialect:
+	# One AviUtl version: the ExoVideo / SceneSettings its objects are written with. The effect
+	# sections are the same for every object of a version, so their text is compiled once here
+	# and shared by the templates of all channels
+	def __init__(self, name, label, ExoVideo, SceneSettings):
+		self.name, self.label = name, label
+		self.ExoVideo, self.SceneSettings = ExoVideo, SceneSettings
+		self.effects = ObjectTemplate.compileEffects(ExoVideo()['effects'])
+	def template(self, path, alpha=0, newline=linesep):
+		return ObjectTemplate(self.ExoVideo(video=self.SceneSettings(path, alpha=alpha)), self.effects, newline)
+
+# Versions by the name used for Project.dialect and --dialect. A new version is one more
+# register call, usually with an ExoVideo subclass like the one in exo117b
+dialects = {}
+def register(dialect):
+	dialects[dialect.name] = dialect
+	return dialect
+register(Dialect('116d', 'AviUtl 中文版 1.16d', exo.ExoVideo, exo.SceneSettings))
+register(Dialect('117b', 'AviUtl 中文版 1.17b', exo117b.ExoVideo, exo117b.SceneSettings))
@@ -1,4 +1,6 @@
 class ExoVideo(dict):
+	# 1.16d; later versions subclass it and only change what differs (see dialects)
+	transformName = '标准变换'
 	def __init__(self, start=1, end=2, layer=1, group=1, overlay=1, camera=0, video={}, flip=0):
 		dict.__init__(self, {
 				'start': start,
@@ -18,7 +20,7 @@ class ExoVideo(dict):
 						'透明度反转': 0
 					},
 					{
-						'_name': '标准变换',
+						'_name': self.transformName,
 						'X': 0.0,
 						'Y': 0.0,
 						'Z': 0.0,
@@ -0,0 +1,73 @@
+from array import array
+from bisect import bisect
+from mmap import mmap, ACCESS_READ
+from os import fstat
+from re import M, compile, escape
+from pyaviutl.template import ExoObject, ObjectTemplate
+
+class ExoTimeline:
+	# What readExo keeps of an exo file: the [exedit] settings (as text), one ExoObject per
+	# object in file order, the number the next object would get, the byte offset where the
+	# sections after [exedit] begin, so they can be copied unchanged, and the file's line ending
+	def __init__(self, exedit, objects, nextId, bodyOffset, newline):
+		self.exedit, self.objects, self.nextId, self.bodyOffset = exedit, objects, nextId, bodyOffset
+		self.newline = newline
+	def maxLayer(self):
+		return max((obj.layer for obj in self.objects), default=0)
+
+# Only three kinds of lines are looked for, each with one scan of the mapped file: [N] object
+# headers, normally followed by start / end / layer (/ group) in that order, the per-object
+# fields when they are not, and the flip of the effects
+headerPattern = compile(rb'\n\[([0-9]+)\]\r?\n')
+objectPattern = compile(rb'\n\[[0-9]+\]\r?\nstart=(-?[0-9]+)\r?\nend=(-?[0-9]+)\r?\nlayer=(-?[0-9]+)\r?\n(?:group=(-?[0-9]+)\r?\n)?')
+fieldPattern = compile(rb'^(start|end|layer|group)=(-?[0-9]+)\r?$', M)
+flipPattern = compile(rb'\n' + escape(ObjectTemplate.flipKey.encode('GBK')) + rb'=(-?[0-9]+)')
+def readExo(path, encoding='GBK'):
+	with open(path, 'rb') as f:
+		exedit, bodyOffset, newline = readExedit(f, encoding)
+		if not exedit:
+			raise ValueError('{0} has no [exedit] section'.format(path))
+		if bodyOffset == fstat(f.fileno()).st_size:
+			return ExoTimeline(exedit, [], 0, bodyOffset, newline)
+		with mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+			objects, nextId = readObjects(data, bodyOffset)
+	return ExoTimeline(exedit, objects, nextId, bodyOffset, newline)
+def readExedit(f, encoding):
+	# Reads lines up to the first section after [exedit]; returns its values, that section's
+	# offset and the line ending of the [exedit] line
+	exedit, offset, inExedit, newline = {}, 0, False, '\n'
+	for line in f:
+		text = line.rstrip(b'\r\n')
+		if text[:1] == b'[' and text[-1:] == b']':
+			if text != b'[exedit]':
+				break
+			inExedit = True
+			newline = '\r\n' if line.endswith(b'\r\n') else '\n'
+		elif inExedit:
+			key, eq, value = text.partition(b'=')
+			if eq:
+				exedit[key.decode(encoding)] = value.decode(encoding)
+		offset += len(line)
+	return exedit, offset, newline
+def readObjects(data, offset):
+	objects, positions, nextId = [], array('q'), 0
+	# offset is the start of a line, so the search starts at the newline before it
+	for match in headerPattern.finditer(data, offset - 1):
+		nextId = max(nextId, int(match.group(1)) + 1)
+		positions.append(match.start())
+		fields = objectPattern.match(data, match.start())
+		if fields is not None:
+			start, end, layer, group = fields.groups()
+			objects.append(ExoObject(int(start), int(end), int(layer), 1 if group is None else int(group)))
+			continue
+		obj = ExoObject()
+		bodyEnd = data.find(b'\n[', match.end())
+		for key, value in fieldPattern.findall(data, match.end(), len(data) if bodyEnd < 0 else bodyEnd):
+			setattr(obj, key.decode(), int(value))
+		objects.append(obj)
+	# a flip belongs to the object whose header comes last before it
+	for match in flipPattern.finditer(data, offset - 1):
+		index = bisect(positions, match.start()) - 1
+		if index >= 0:
+			objects[index].flip = int(match.group(1))
+	return objects, nextId
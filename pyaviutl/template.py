@@ -0,0 +1,74 @@
+from os import linesep
+
+class ExoObject:
+	__slots__ = ('start', 'end', 'layer', 'group', 'flip')
+	def __init__(self, start=1, end=2, layer=1, group=1, flip=0):
+		self.start, self.end, self.layer, self.group, self.flip = start, end, layer, group, flip
+def encodeText(text, encoding='GBK', newline=linesep):
+	# The bytes a text mode file would write for text; newline can be set to match an existing file
+	return (text if newline == '\n' else text.replace('\n', newline)).encode(encoding)
+class ObjectTemplate:
+	# Shared constant part of an object (scene settings and effects), compiled once into a list
+	# of literal text and the names of the fields filled in per object. For every flip value it
+	# is then encoded once into a GBK bytes format, so rendering an object is a single % with its
+	# number and times. effects may be passed already compiled (see Dialect), as they are the
+	# same for every channel
+	perObject = ('start', 'end', 'layer', 'group')
+	flipKey = '左右翻转'
+	def __init__(self, video, effects=None, newline=linesep):
+		self.video = video
+		self.pieces = self.compile(video, effects)
+		self.formats = {}
+		self.newline = newline
+	@classmethod
+	def compile(cls, video, effects=None):
+		# literal text at even indices, field names at odd ones
+		pieces = ['[', 'key', ']\n']
+		for ikey, ival in video.items():
+			if ikey in cls.perObject:
+				pieces[-1] += '{0}='.format(ikey)
+				pieces.extend((ikey, '\n'))
+			elif ikey == 'sceneSettings':
+				pieces[-1] += '['
+				pieces.extend(('key', '.0]\n'))
+				for skey, sval in ival.items():
+					if skey == 'scene':
+						pieces[-1] += '={0}\n'.format(sval)
+					else:
+						pieces[-1] += '{0}={1}\n'.format(skey, sval)
+			elif ikey == 'effects':
+				compiled = cls.compileEffects(ival) if effects is None else effects
+				pieces[-1] += compiled[0]
+				pieces.extend(compiled[1:])
+			else:
+				pieces[-1] += '{0}={1}\n'.format(ikey, ival)
+		return pieces
+	@classmethod
+	def compileEffects(cls, effects):
+		pieces = ['']
+		for attid, e in enumerate(effects, 1):
+			pieces[-1] += '['
+			pieces.extend(('key', '.{0}]\n'.format(attid)))
+			for akey, aval in e.items():
+				if akey == cls.flipKey:
+					pieces[-1] += '{0}='.format(akey)
+					pieces.extend(('flip', '\n'))
+				else:
+					pieces[-1] += '{0}={1}\n'.format(akey, aval)
+		return pieces
+	def compileFlip(self, flip):
+		text = []
+		for index, piece in enumerate(self.pieces):
+			if index % 2 == 0:
+				text.append(piece.replace('%', '%%'))
+			elif piece == 'flip':
+				text.append(str(flip))
+			else:
+				text.append('%({0}){1}'.format(piece, 'b' if piece == 'key' else 'd'))
+		# GBK never has '%' as the second byte of a character, so the escapes stay intact
+		self.formats[flip] = encodeText(''.join(text), newline=self.newline)
+		return self.formats[flip]
+	def render(self, key, obj):
+		# key is the object number, or bytes that stand in for it (see ExoCache)
+		fmt = self.formats.get(obj.flip) or self.compileFlip(obj.flip)
+		return fmt % {b'key': key if type(key) is bytes else b'%d' % key, b'start': obj.start, b'end': obj.end, b'layer': obj.layer, b'group': obj.group}
@@ -0,0 +1,58 @@
+from os import getpid, linesep, remove, replace
+from shutil import copyfileobj
+from pyaviutl.template import encodeText
+
+class ExoWriter:
+	# Writes to a temporary file next to path and only replaces path once everything was
+	# written, so a failed or cancelled export never leaves a truncated file behind. The file is
+	# binary: templated objects arrive as GBK bytes, other text is encoded as a text file would be,
+	# with newline as line ending (that of the templates written with it should be the same)
+	def __init__(self, path, bufferSize=1<<20, newline=linesep):
+		self.path = path
+		self.newline = newline
+		self.tmpPath = '{0}.{1}-{2:x}.tmp'.format(path, getpid(), id(self))
+		self.f = open(self.tmpPath, 'xb', buffering=bufferSize)
+		self.count = 0
+	def __enter__(self):
+		return self
+	def __exit__(self, excType, exc, tb):
+		if self.f.closed:
+			return
+		if excType is None:
+			self.close()
+		else:
+			self.discard()
+	def close(self):
+		self.f.close()
+		replace(self.tmpPath, self.path)
+	def discard(self):
+		self.f.close()
+		remove(self.tmpPath)
+	def writeSection(self, name, values):
+		lines = ['[{0}]\n'.format(name)]
+		for key, value in values.items():
+			lines.append('{0}={1}\n'.format(key, value))
+		self.f.write(encodeText(''.join(lines), newline=self.newline))
+	def writeExedit(self, exedit):
+		self.writeSection('exedit', exedit)
+	def writeTemplated(self, template, obj):
+		key = self.count
+		self.f.write(template.render(key, obj))
+		self.count += 1
+		return key
+	def writeRendered(self, data, count):
+		# Writes count objects that were already rendered with their final numbers
+		self.f.write(data)
+		self.count += count
+	def copyFrom(self, path, offset, count):
+		# Copies the bytes of path from offset on unchanged (the objects of an existing exo), and
+		# numbers what is written next after its count objects
+		with open(path, 'rb') as src:
+			src.seek(offset)
+			copyfileobj(src, self.f, 1<<20)
+			end = src.tell()
+			if end > offset:
+				src.seek(end - 1)
+				if src.read(1) != b'\n':
+					self.f.write(encodeText('\n', newline=self.newline))
+		self.count = count